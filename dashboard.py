@@ -4,16 +4,28 @@ Auto Ack Dashboard for Production
 Clean version without test data and SocketIO
 """
 
-from flask import Flask, render_template_string, jsonify, request, Response
+from flask import Flask, render_template_string, jsonify, request, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
+import click
 from datetime import datetime, timedelta
+from collections import namedtuple
+from functools import wraps
+import base64
+import gzip
+import hashlib
 import json
 import os
+import queue
+import threading
+import time
 import logging
 import csv
 from io import StringIO
-from sqlalchemy import and_, or_, func
+from sqlalchemy import or_, func, text, event, null
 from dotenv import load_dotenv
+import recorder
+from recorder import (metadata, acknowledgments, hourly_rollup, daily_rollup, engine_options, truncate_hour,
+                      merge_rollup, rebuild_rollup, retry_on_lock)
 
 # Load environment variables
 load_dotenv()
@@ -24,25 +36,30 @@ app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('FLASK_SECRET_KEY', 'dev-secret-key')
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///centreon_dashboard.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['HISTORY_PAGE_SIZE'] = int(os.getenv('HISTORY_PAGE_SIZE', 100))
+app.config['HISTORY_MAX_PAGE_SIZE'] = int(os.getenv('HISTORY_MAX_PAGE_SIZE', 1000))
+app.config['API_CACHE_TTL'] = float(os.getenv('API_CACHE_TTL', 10))
+app.config['SSE_POLL_INTERVAL'] = float(os.getenv('SSE_POLL_INTERVAL', 2))
+app.config['SSE_HEARTBEAT'] = float(os.getenv('SSE_HEARTBEAT', 15))
+app.config['RETENTION_DAYS'] = int(os.getenv('RETENTION_DAYS', 0))
+app.config['RETENTION_CHUNK_SIZE'] = int(os.getenv('RETENTION_CHUNK_SIZE', 1000))
+app.config['RETENTION_PAUSE'] = float(os.getenv('RETENTION_PAUSE', 0.1))
+app.config['RETENTION_INTERVAL'] = float(os.getenv('RETENTION_INTERVAL', 24))
+app.config['VACUUM_FREE_RATIO'] = float(os.getenv('VACUUM_FREE_RATIO', 0.2))
+app.config['ARCHIVE_DIR'] = os.getenv('ARCHIVE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'archive'))
 
-# Extensions
-db = SQLAlchemy(app)
+# Connection pool, see recorder.engine_options()
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+
+# Extensions, models share the tables of the recorder
+db = SQLAlchemy(app, metadata=metadata)
 
 # ===============================================
 # DATABASE MODELS
 # ===============================================
 
 class AlertAcknowledgment(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    service_id = db.Column(db.String(50), nullable=False)
-    host_id = db.Column(db.String(50), nullable=False)
-    service_name = db.Column(db.String(200))
-    host_name = db.Column(db.String(200))
-    status = db.Column(db.String(20))
-    acknowledged_at = db.Column(db.DateTime, default=datetime.utcnow)
-    success = db.Column(db.Boolean, default=True)
-    error_message = db.Column(db.Text)
-    response_time = db.Column(db.Float)
+    __table__ = acknowledgments
     
     def to_dict(self):
         return {
@@ -55,9 +72,20 @@ class AlertAcknowledgment(db.Model):
             'acknowledged_at': self.acknowledged_at.isoformat() if self.acknowledged_at else None,
             'success': self.success,
             'error_message': self.error_message,
-            'response_time': self.response_time
+            'response_time': self.response_time,
+            'connect_time': self.connect_time,
+            'server_time': self.server_time,
+            'retry_count': self.retry_count
         }
 
+class HourlyRollup(db.Model):
+    """Acknowledgment counts per hour, status and result, maintained on write"""
+    __table__ = hourly_rollup
+
+class DailyRollup(db.Model):
+    """Acknowledgment counts per day, status and result, for hours past the retention period"""
+    __table__ = daily_rollup
+
 # ===============================================
 # HTML TEMPLATES
 # ===============================================
@@ -127,7 +155,7 @@ DASHBOARD_TEMPLATE = """
             <div class="col-md-3">
                 <div class="card metric-card">
                     <div class="metric-value text-info" id="avgTime">-</div>
-                    <div>Avg Time (s)</div>
+                    <div>Response Time p50 / p95 / p99 (s)</div>
                 </div>
             </div>
         </div>
@@ -177,21 +205,27 @@ DASHBOARD_TEMPLATE = """
 
     <script>
         let hourlyChart, statusChart;
+        let counters = { total: 0, successful: 0 };
+        let recentAcks = [];
+        const RECENT_LIMIT = 5;
 
         async function loadData() {
             try {
+                // Whole page in one round trip
+                const response = await fetch('/api/dashboard?recent=5');
+                const data = await response.json();
+                
                 // Stats
-                const statsResponse = await fetch('/api/stats');
-                const stats = await statsResponse.json();
+                const stats = data.stats;
                 
-                document.getElementById('totalAcks').textContent = stats.last_24h.total_acks;
-                document.getElementById('successfulAcks').textContent = stats.last_24h.successful_acks;
-                document.getElementById('successRate').textContent = stats.last_24h.success_rate + '%';
-                document.getElementById('avgTime').textContent = stats.performance.avg_response_time + 's';
+                counters = { total: stats.last_24h.total_acks, successful: stats.last_24h.successful_acks };
+                renderCounters();
+                const perf = stats.performance;
+                document.getElementById('avgTime').textContent = perf.p50_response_time === null ? '-' :
+                    [perf.p50_response_time, perf.p95_response_time, perf.p99_response_time].join(' / ');
 
                 // Hourly chart
-                const chartResponse = await fetch('/api/charts/hourly');
-                const chartData = await chartResponse.json();
+                const chartData = data.hourly;
                 
                 if (hourlyChart) hourlyChart.destroy();
                 const ctx = document.getElementById('hourlyChart').getContext('2d');
@@ -206,8 +240,7 @@ DASHBOARD_TEMPLATE = """
                 });
 
                 // Status chart
-                const statusResponse = await fetch('/api/charts/status-distribution');
-                const statusData = await statusResponse.json();
+                const statusData = data.status_distribution;
                 
                 if (statusChart) statusChart.destroy();
                 const statusCtx = document.getElementById('statusChart').getContext('2d');
@@ -221,22 +254,8 @@ DASHBOARD_TEMPLATE = """
                 });
 
                 // Recent activity
-                const activityResponse = await fetch('/api/recent-acks?limit=5');
-                const activity = await activityResponse.json();
-                
-                const activityHtml = activity.acknowledgments.map(ack => `
-                    <div class="border-start border-3 ${ack.success ? 'border-success' : 'border-danger'} ps-3 mb-2">
-                        <strong>${ack.service_name || ack.service_id}</strong> on <strong>${ack.host_name || ack.host_id}</strong>
-                        <br><small class="text-muted">${new Date(ack.acknowledged_at).toLocaleString()}</small>
-                        <span class="badge bg-${ack.success ? 'success' : 'danger'} ms-2">
-                            ${ack.success ? 'Success' : 'Failed'}
-                        </span>
-                        ${ack.status ? `<span class="badge bg-secondary ms-1">${ack.status}</span>` : ''}
-                    </div>
-                `).join('');
-                
-                document.getElementById('recentActivity').innerHTML = 
-                    activityHtml || '<p class="text-muted">No recent activity</p>';
+                recentAcks = data.recent_acks.acknowledgments;
+                renderActivity();
 
             } catch (error) {
                 console.error('Error:', error);
@@ -245,8 +264,76 @@ DASHBOARD_TEMPLATE = """
             }
         }
 
-        document.addEventListener('DOMContentLoaded', loadData);
-        setInterval(loadData, 30000); // Auto-refresh every 30 seconds
+        function renderCounters() {
+            document.getElementById('totalAcks').textContent = counters.total;
+            document.getElementById('successfulAcks').textContent = counters.successful;
+            const rate = counters.total ? Math.round(counters.successful / counters.total * 10000) / 100 : 0;
+            document.getElementById('successRate').textContent = rate + '%';
+        }
+
+        function renderActivity() {
+            const activityHtml = recentAcks.map(ack => `
+                <div class="border-start border-3 ${ack.success ? 'border-success' : 'border-danger'} ps-3 mb-2">
+                    <strong>${ack.service_name || ack.service_id}</strong> on <strong>${ack.host_name || ack.host_id}</strong>
+                    <br><small class="text-muted">${new Date(ack.acknowledged_at).toLocaleString()}</small>
+                    <span class="badge bg-${ack.success ? 'success' : 'danger'} ms-2">
+                        ${ack.success ? 'Success' : 'Failed'}
+                    </span>
+                    ${ack.status ? `<span class="badge bg-secondary ms-1">${ack.status}</span>` : ''}
+                </div>
+            `).join('');
+            
+            document.getElementById('recentActivity').innerHTML = 
+                activityHtml || '<p class="text-muted">No recent activity</p>';
+        }
+
+        // Applies the rows pushed by /api/stream without querying the server
+        function applyUpdate(update) {
+            counters.total += update.counters.total;
+            counters.successful += update.counters.successful;
+            renderCounters();
+
+            update.acknowledgments.forEach(ack => {
+                if (hourlyChart) {
+                    // Same UTC hour of day as the server side buckets
+                    const hour = parseInt(ack.acknowledged_at.substring(11, 13), 10);
+                    hourlyChart.data.datasets[ack.success ? 0 : 1].data[hour] += 1;
+                }
+                if (statusChart) {
+                    const label = ack.status || 'UNKNOWN';
+                    const index = statusChart.data.labels.indexOf(label);
+                    if (index >= 0) {
+                        statusChart.data.datasets[0].data[index] += 1;
+                    } else {
+                        statusChart.data.labels.push(label);
+                        statusChart.data.datasets[0].data.push(1);
+                    }
+                }
+            });
+            if (hourlyChart) hourlyChart.update();
+            if (statusChart) statusChart.update();
+
+            recentAcks = update.acknowledgments.slice().reverse().concat(recentAcks).slice(0, RECENT_LIMIT);
+            renderActivity();
+        }
+
+        function connectStream() {
+            const source = new EventSource('/api/stream');
+            // Sent on every (re)connection, reload the full state once
+            source.addEventListener('hello', loadData);
+            source.addEventListener('acks', event => applyUpdate(JSON.parse(event.data)));
+        }
+
+        document.addEventListener('DOMContentLoaded', () => {
+            if (window.EventSource) {
+                connectStream();
+                // Slides the 24h window and refreshes the percentiles
+                setInterval(loadData, 300000);
+            } else {
+                loadData();
+                setInterval(loadData, 30000); // Auto-refresh every 30 seconds
+            }
+        });
     </script>
 </body>
 </html>
@@ -387,6 +474,7 @@ HISTORY_TEMPLATE = """
                                 </tbody>
                             </table>
                         </div>
+                        <div id="historySentinel" class="text-center text-muted small py-2"></div>
                     </div>
                 </div>
             </div>
@@ -395,8 +483,12 @@ HISTORY_TEMPLATE = """
 
     <script>
         let currentHistoryData = [];
+        let historyParams = null;
+        let nextCursor = null;
+        let historyGeneration = 0;
+        let loadingHistory = false;
 
-        async function loadHistoryData() {
+        function buildHistoryParams() {
             const period = document.getElementById('periodFilter').value;
             const status = document.getElementById('statusFilter').value;
             const success = document.getElementById('successFilter').value;
@@ -412,43 +504,94 @@ HISTORY_TEMPLATE = """
             
             if (status) params.append('status', status);
             if (success) params.append('success', success);
+            return params;
+        }
+
+        async function loadHistoryData() {
+            // Responses of requests made for the previous filters are dropped
+            historyGeneration++;
+            historyParams = buildHistoryParams();
+            currentHistoryData = [];
+            nextCursor = null;
+            await fetchHistoryPage(null);
+        }
+
+        async function loadMoreHistory() {
+            if (!nextCursor || loadingHistory) return;
+            await fetchHistoryPage(nextCursor);
+        }
+
+        function renderHistoryRow(ack) {
+            return `
+                <tr>
+                    <td>${new Date(ack.acknowledged_at).toLocaleString()}</td>
+                    <td><strong>${ack.service_name || ack.service_id}</strong></td>
+                    <td><strong>${ack.host_name || ack.host_id}</strong></td>
+                    <td><span class="badge bg-${getStatusColor(ack.status)}">${ack.status || 'UNKNOWN'}</span></td>
+                    <td><span class="badge ${ack.success ? 'bg-success' : 'bg-danger'}">${ack.success ? 'Success' : 'Failed'}</span></td>
+                    <td>${ack.response_time ? ack.response_time.toFixed(3) : '-'}</td>
+                    <td>${ack.error_message ? `<span class="text-danger" title="${ack.error_message}">${ack.error_message.substring(0, 30)}...</span>` : '-'}</td>
+                </tr>
+            `;
+        }
+
+        async function fetchHistoryPage(cursor) {
+            const generation = historyGeneration;
+            loadingHistory = true;
+            const sentinel = document.getElementById('historySentinel');
+            sentinel.textContent = 'Loading...';
+            
+            const params = new URLSearchParams(historyParams);
+            if (cursor) params.append('cursor', cursor);
             
             try {
                 const response = await fetch('/api/history?' + params);
                 const data = await response.json();
+                if (generation !== historyGeneration) return;
+                const rows = data.acknowledgments || [];
                 
-                currentHistoryData = data.acknowledgments || [];
+                currentHistoryData = currentHistoryData.concat(rows);
+                nextCursor = data.next_cursor;
                 
-                // Update stats
-                const stats = data.stats || {};
-                document.getElementById('histTotal').textContent = stats.total || 0;
-                document.getElementById('histSuccess').textContent = stats.successful || 0;
-                document.getElementById('histFailed').textContent = stats.failed || 0;
-                document.getElementById('histAvgTime').textContent = 
-                    stats.avg_response_time ? stats.avg_response_time.toFixed(3) + 's' : '-';
+                // Stats come with the first page only
+                if (data.stats) {
+                    const stats = data.stats;
+                    document.getElementById('histTotal').textContent = stats.total || 0;
+                    document.getElementById('histSuccess').textContent = stats.successful || 0;
+                    document.getElementById('histFailed').textContent = stats.failed || 0;
+                    document.getElementById('histAvgTime').textContent = 
+                        stats.avg_response_time ? stats.avg_response_time.toFixed(3) + 's' : '-';
+                }
                 
                 // Update table
                 const tableBody = document.getElementById('historyTable');
+                if (!cursor) tableBody.innerHTML = '';
                 if (currentHistoryData.length === 0) {
                     tableBody.innerHTML = '<tr><td colspan="7" class="text-center text-muted">No data found</td></tr>';
                 } else {
-                    tableBody.innerHTML = currentHistoryData.map(ack => `
-                        <tr>
-                            <td>${new Date(ack.acknowledged_at).toLocaleString()}</td>
-                            <td><strong>${ack.service_name || ack.service_id}</strong></td>
-                            <td><strong>${ack.host_name || ack.host_id}</strong></td>
-                            <td><span class="badge bg-${getStatusColor(ack.status)}">${ack.status || 'UNKNOWN'}</span></td>
-                            <td><span class="badge ${ack.success ? 'bg-success' : 'bg-danger'}">${ack.success ? 'Success' : 'Failed'}</span></td>
-                            <td>${ack.response_time ? ack.response_time.toFixed(3) : '-'}</td>
-                            <td>${ack.error_message ? `<span class="text-danger" title="${ack.error_message}">${ack.error_message.substring(0, 30)}...</span>` : '-'}</td>
-                        </tr>
-                    `).join('');
+                    tableBody.insertAdjacentHTML('beforeend', rows.map(renderHistoryRow).join(''));
                 }
                 
+                sentinel.textContent = nextCursor ? '' :
+                    (currentHistoryData.length ? `All ${currentHistoryData.length} rows loaded` : '');
+                
             } catch (error) {
+                if (generation !== historyGeneration) return;
                 console.error('Error:', error);
-                document.getElementById('historyTable').innerHTML = 
-                    '<tr><td colspan="7" class="text-center text-danger">Error loading data</td></tr>';
+                if (!cursor) {
+                    document.getElementById('historyTable').innerHTML = 
+                        '<tr><td colspan="7" class="text-center text-danger">Error loading data</td></tr>';
+                }
+                sentinel.textContent = 'Error loading data';
+                nextCursor = null;
+            } finally {
+                if (generation === historyGeneration) loadingHistory = false;
+            }
+            if (generation !== historyGeneration) return;
+            
+            // Short pages may leave the sentinel visible: keep filling the screen
+            if (nextCursor && sentinel.getBoundingClientRect().top < window.innerHeight) {
+                loadMoreHistory();
             }
         }
 
@@ -461,35 +604,17 @@ HISTORY_TEMPLATE = """
         }
 
         function exportData() {
-            if (currentHistoryData.length === 0) {
-                alert('No data to export');
-                return;
-            }
-            
-            const csv = [
-                ['Date/Time', 'Service', 'Host', 'Status', 'Result', 'Time', 'Error'],
-                ...currentHistoryData.map(ack => [
-                    new Date(ack.acknowledged_at).toLocaleString(),
-                    ack.service_name || ack.service_id,
-                    ack.host_name || ack.host_id,
-                    ack.status || '',
-                    ack.success ? 'Success' : 'Failed',
-                    ack.response_time || '',
-                    ack.error_message || ''
-                ])
-            ].map(row => row.map(cell => '"' + String(cell).replace(/"/g, '""') + '"').join(',')).join('\\n');
-            
-            const blob = new Blob([csv], { type: 'text/csv' });
-            const url = window.URL.createObjectURL(blob);
-            const a = document.createElement('a');
-            a.href = url;
-            a.download = 'centreon_history.csv';
-            a.click();
-            window.URL.revokeObjectURL(url);
+            // Streamed by the server with the current filters, not limited to loaded rows
+            const params = new URLSearchParams(historyParams || buildHistoryParams());
+            params.append('format', 'csv');
+            window.location = '/api/export?' + params;
         }
 
-        // Load default data
+        // Load default data, then more rows as the table scrolls into view
         document.addEventListener('DOMContentLoaded', () => {
+            new IntersectionObserver(entries => {
+                if (entries.some(entry => entry.isIntersecting)) loadMoreHistory();
+            }).observe(document.getElementById('historySentinel'));
             setTimeout(loadHistoryData, 500);
         });
     </script>
@@ -497,6 +622,198 @@ HISTORY_TEMPLATE = """
 </html>
 """
 
+# ===============================================
+# RESPONSE CACHE
+# ===============================================
+
+class ResponseCache:
+    """
+    JSON API responses kept for a TTL, dropped whenever an acknowledgment
+    is written. Entries keep their ETag and Last-Modified across refreshes
+    as long as the payload does not change.
+    """
+    
+    MAX_ENTRIES = 256
+    
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.entries = {}
+        self.generation = 0
+        self.lock = threading.Lock()
+    
+    def get(self, key):
+        """Fresh entry for a key, or None"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry['generation'] == self.generation and entry['expires_at'] > time.monotonic():
+                return entry
+            return None
+    
+    def put(self, key, body, generation):
+        """
+        Store a payload computed from the data of generation. It is served
+        but not stored if an acknowledgment was written since.
+        """
+        etag = hashlib.sha1(body).hexdigest()
+        with self.lock:
+            previous = self.entries.get(key)
+            if len(self.entries) >= self.MAX_ENTRIES and previous is None:
+                self.entries.clear()
+            entry = {
+                'body': body,
+                'etag': etag,
+                'last_modified': previous['last_modified'] if previous and previous['etag'] == etag
+                                 else datetime.utcnow().replace(microsecond=0),
+                'expires_at': time.monotonic() + self.ttl,
+                'generation': generation
+            }
+            if generation == self.generation:
+                self.entries[key] = entry
+            return entry
+    
+    def invalidate(self):
+        with self.lock:
+            self.generation += 1
+
+response_cache = ResponseCache(app.config['API_CACHE_TTL'])
+
+def cached_api(view):
+    """Serve a JSON API from response_cache, answering 304 when the client copy is current"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.full_path
+        entry = response_cache.get(key)
+        if entry is None:
+            # Read before querying: a write during the view makes the payload stale
+            generation = response_cache.generation
+            response = app.make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            entry = response_cache.put(key, response.get_data(), generation)
+        
+        response = Response(entry['body'], mimetype='application/json')
+        response.set_etag(entry['etag'])
+        response.last_modified = entry['last_modified']
+        # Browsers revalidate on every poll, the server answers 304 if unchanged
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+    return wrapper
+
+# ===============================================
+# LIVE UPDATES
+# ===============================================
+
+class AckBroadcaster:
+    """
+    Fan-out of new acknowledgments to Server-Sent Events subscribers.
+    
+    A single watcher thread reads rows past the last seen id and hands the
+    same event to every subscriber queue. It is woken right away by writes
+    made in this process and polls every SSE_POLL_INTERVAL seconds for rows
+    written by the acknowledgment script.
+    """
+    
+    QUEUE_SIZE = 100
+    BATCH_SIZE = 500
+    # Last item of the queue of a dropped subscriber, its stream ends on it
+    CLOSED = object()
+    
+    def __init__(self, poll_interval):
+        self.poll_interval = poll_interval
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.last_id = None
+    
+    def subscribe(self):
+        subscriber = queue.Queue(maxsize=self.QUEUE_SIZE)
+        with self.lock:
+            self.subscribers.add(subscriber)
+            if self.thread is None or not self.thread.is_alive():
+                # Baseline taken before the hello event is sent, so the page reloads after it
+                try:
+                    self._poll()
+                except Exception as e:
+                    app.logger.error(f"Error reading new acknowledgments: {e}")
+                self.thread = threading.Thread(target=self._run, name='ack-broadcaster', daemon=True)
+                self.thread.start()
+        return subscriber
+    
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+    
+    def notify(self):
+        """Called after a commit, new rows are published without waiting for the next poll"""
+        self.wakeup.set()
+    
+    def publish(self, event):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                # Slow client: its stream is closed, the browser reconnects and reloads the full state
+                self.unsubscribe(subscriber)
+                self._close(subscriber)
+    
+    def _close(self, subscriber):
+        # Only the watcher thread puts, so one slot freed here stays free for CLOSED
+        try:
+            subscriber.get_nowait()
+        except queue.Empty:
+            pass
+        subscriber.put_nowait(self.CLOSED)
+    
+    def _run(self):
+        while True:
+            with self.lock:
+                if not self.subscribers:
+                    self.thread = None
+                    self.last_id = None
+                    return
+            try:
+                with app.app_context():
+                    self._poll()
+                    db.session.remove()
+            except Exception as e:
+                app.logger.error(f"Error reading new acknowledgments: {e}")
+            self.wakeup.wait(self.poll_interval)
+            self.wakeup.clear()
+    
+    def _poll(self):
+        if self.last_id is None:
+            self.last_id = db.session.query(func.coalesce(func.max(AlertAcknowledgment.id), 0)).scalar()
+            # Rows up to the baseline are never pushed: the reload after hello must not get an older snapshot
+            response_cache.invalidate()
+            return
+        
+        acks = AlertAcknowledgment.query.filter(
+            AlertAcknowledgment.id > self.last_id
+        ).order_by(AlertAcknowledgment.id).limit(self.BATCH_SIZE).all()
+        if not acks:
+            return
+        
+        self.last_id = acks[-1].id
+        # Rows written by another process also make cached responses stale
+        response_cache.invalidate()
+        
+        successful = sum(1 for ack in acks if ack.success)
+        self.publish({
+            'acknowledgments': [ack.to_dict() for ack in acks],
+            'counters': {
+                'total': len(acks),
+                'successful': successful,
+                'failed': len(acks) - successful
+            }
+        })
+        if len(acks) == self.BATCH_SIZE:
+            self.wakeup.set()
+
+ack_broadcaster = AckBroadcaster(app.config['SSE_POLL_INTERVAL'])
+
 # ===============================================
 # ROUTES
 # ===============================================
@@ -512,219 +829,822 @@ def history():
     return render_template_string(HISTORY_TEMPLATE)
 
 @app.route('/api/stats')
+@cached_api
 def api_stats():
     """API: General statistics"""
     try:
         yesterday = datetime.utcnow() - timedelta(days=1)
-        
-        total_acks_24h = AlertAcknowledgment.query.filter(
-            AlertAcknowledgment.acknowledged_at >= yesterday
-        ).count()
-        
-        successful_acks_24h = AlertAcknowledgment.query.filter(
-            AlertAcknowledgment.acknowledged_at >= yesterday,
-            AlertAcknowledgment.success == True
-        ).count()
-        
-        success_rate = (successful_acks_24h / total_acks_24h * 100) if total_acks_24h > 0 else 0
-        
-        avg_response_time = db.session.query(
-            db.func.avg(AlertAcknowledgment.response_time)
-        ).filter(
-            AlertAcknowledgment.acknowledged_at >= yesterday,
-            AlertAcknowledgment.response_time.isnot(None)
-        ).scalar() or 0
-        
-        return jsonify({
-            'last_24h': {
-                'total_acks': total_acks_24h,
-                'successful_acks': successful_acks_24h,
-                'failed_acks': total_acks_24h - successful_acks_24h,
-                'success_rate': round(success_rate, 2)
-            },
-            'performance': {
-                'avg_response_time': round(avg_response_time, 3)
-            }
-        })
+        return jsonify(stats_payload(rollup_since(yesterday), yesterday))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/charts/hourly')
+@cached_api
 def api_charts_hourly():
     """API: Hourly chart"""
     try:
         yesterday = datetime.utcnow() - timedelta(days=1)
-        
-        results = db.session.query(
-            db.func.strftime('%H', AlertAcknowledgment.acknowledged_at).label('hour'),
-            db.func.count(AlertAcknowledgment.id).label('total'),
-            db.func.sum(db.case([(AlertAcknowledgment.success == True, 1)], else_=0)).label('success'),
-            db.func.sum(db.case([(AlertAcknowledgment.success == False, 1)], else_=0)).label('failed')
-        ).filter(
-            AlertAcknowledgment.acknowledged_at >= yesterday
-        ).group_by(
-            db.func.strftime('%H', AlertAcknowledgment.acknowledged_at)
-        ).all()
-        
-        hours = [f"{i:02d}:00" for i in range(24)]
-        successes = [0] * 24
-        failures = [0] * 24
-        
-        for result in results:
-            hour_index = int(result.hour)
-            successes[hour_index] = result.success or 0
-            failures[hour_index] = result.failed or 0
-        
-        return jsonify({
-            'labels': hours,
-            'datasets': [
-                {
-                    'label': 'Successful',
-                    'data': successes,
-                    'backgroundColor': 'rgba(40, 167, 69, 0.8)'
-                },
-                {
-                    'label': 'Failed',
-                    'data': failures,
-                    'backgroundColor': 'rgba(220, 53, 69, 0.8)'
-                }
-            ]
-        })
+        return jsonify(hourly_payload(rollup_since(yesterday)))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/charts/status-distribution')
+@cached_api
 def api_charts_status():
     """API: Status distribution"""
     try:
         yesterday = datetime.utcnow() - timedelta(days=1)
-        
-        results = db.session.query(
-            AlertAcknowledgment.status,
-            db.func.count(AlertAcknowledgment.id).label('count')
-        ).filter(
-            AlertAcknowledgment.acknowledged_at >= yesterday
-        ).group_by(AlertAcknowledgment.status).all()
-        
-        labels = []
-        data = []
-        colors = ['#ffc107', '#dc3545']
-        
-        for i, result in enumerate(results):
-            labels.append(result.status or 'UNKNOWN')
-            data.append(result.count)
-        
-        return jsonify({
-            'labels': labels,
-            'datasets': [{
-                'data': data,
-                'backgroundColor': colors[:len(data)]
-            }]
-        })
+        return jsonify(status_payload(rollup_since(yesterday)))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/recent-acks')
+@cached_api
 def api_recent_acks():
     """API: Recent activity"""
     try:
         limit = request.args.get('limit', 10, type=int)
-        recent_acks = AlertAcknowledgment.query.order_by(
-            AlertAcknowledgment.acknowledged_at.desc()
-        ).limit(limit).all()
+        return jsonify(recent_payload(limit))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/dashboard')
+@cached_api
+def api_dashboard():
+    """API: Stats, charts and recent activity of the main page in one response"""
+    try:
+        yesterday = datetime.utcnow() - timedelta(days=1)
+        limit = request.args.get('recent', 5, type=int)
+        
+        # One read of the 24h window feeds every section
+        buckets = rollup_since(yesterday)
         
         return jsonify({
-            'acknowledgments': [ack.to_dict() for ack in recent_acks]
+            'stats': stats_payload(buckets, yesterday),
+            'hourly': hourly_payload(buckets),
+            'status_distribution': status_payload(buckets),
+            'recent_acks': recent_payload(limit)
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/stream')
+def api_stream():
+    """API: Server-Sent Events with the acknowledgments written since the page was loaded"""
+    subscriber = ack_broadcaster.subscribe()
+    heartbeat = app.config['SSE_HEARTBEAT']
+    
+    def events():
+        try:
+            # Lets the page reload its full state after every (re)connection
+            yield f"event: hello\nretry: {int(heartbeat * 1000)}\ndata: {{}}\n\n"
+            while True:
+                try:
+                    update = subscriber.get(timeout=heartbeat)
+                except queue.Empty:
+                    # Comment line, keeps proxies from closing an idle stream
+                    yield ": keepalive\n\n"
+                    continue
+                if update is AckBroadcaster.CLOSED:
+                    return
+                yield f"event: acks\ndata: {json.dumps(update)}\n\n"
+        finally:
+            ack_broadcaster.unsubscribe(subscriber)
+    
+    return Response(
+        events(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/api/history')
 def api_history():
-    """API: History with filters"""
+    """API: History with filters, paginated by cursor on (acknowledged_at, id)"""
     try:
-        start_date = request.args.get('start_date')
-        end_date = request.args.get('end_date')
-        status_filter = request.args.get('status', '').strip()
-        success_filter = request.args.get('success', '').strip()
-        
-        query = AlertAcknowledgment.query
-        
-        if start_date:
-            start_dt = datetime.strptime(start_date, '%Y-%m-%d')
-            query = query.filter(AlertAcknowledgment.acknowledged_at >= start_dt)
-        
-        if end_date:
-            end_dt = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
-            query = query.filter(AlertAcknowledgment.acknowledged_at < end_dt)
-        
-        if status_filter:
-            query = query.filter(AlertAcknowledgment.status == status_filter)
-        
-        if success_filter:
-            success_bool = success_filter.lower() == 'true'
-            query = query.filter(AlertAcknowledgment.success == success_bool)
-        
-        # Stats
-        total_count = query.count()
-        successful_count = query.filter(AlertAcknowledgment.success == True).count()
-        failed_count = total_count - successful_count
+        cursor = request.args.get('cursor')
+        page_size = max(1, min(
+            request.args.get('limit', app.config['HISTORY_PAGE_SIZE'], type=int),
+            app.config['HISTORY_MAX_PAGE_SIZE']
+        ))
+        if cursor:
+            try:
+                cursor_at, cursor_id = decode_cursor(cursor)
+            except (ValueError, TypeError):
+                return jsonify({'error': 'Invalid cursor'}), 400
         
-        avg_response_time = query.filter(
-            AlertAcknowledgment.response_time.isnot(None)
-        ).with_entities(
-            func.avg(AlertAcknowledgment.response_time)
-        ).scalar() or 0
+        query = filtered_history_query(request.args)
+        result = {}
         
-        # Data (limited to 100 for performance)
-        acknowledgments = query.order_by(
-            AlertAcknowledgment.acknowledged_at.desc()
-        ).limit(100).all()
-        
-        return jsonify({
-            'acknowledgments': [ack.to_dict() for ack in acknowledgments],
-            'stats': {
+        # Stats for the whole filtered range, on the first page only
+        if not cursor:
+            total_count, successful_count, timed_count, time_sum = query.with_entities(
+                func.count(AlertAcknowledgment.id),
+                func.coalesce(func.sum(db.case([(AlertAcknowledgment.success == True, 1)], else_=0)), 0),
+                func.count(AlertAcknowledgment.response_time),
+                func.coalesce(func.sum(AlertAcknowledgment.response_time), 0)
+            ).one()
+            # Days purged by the retention only remain as daily totals
+            archived_count, archived_successful, archived_timed, archived_time = archived_history_totals(request.args)
+            total_count += archived_count
+            successful_count += archived_successful
+            timed_count += archived_timed
+            time_sum += archived_time
+            failed_count = total_count - successful_count
+            result['stats'] = {
                 'total': total_count,
                 'successful': successful_count,
                 'failed': failed_count,
+                'archived': archived_count,
                 'success_rate': (successful_count / total_count * 100) if total_count > 0 else 0,
-                'avg_response_time': avg_response_time
+                'avg_response_time': time_sum / timed_count if timed_count else 0
             }
-        })
+        
+        # Rows strictly after the cursor, so any page costs the same
+        if cursor:
+            query = query.filter(
+                AlertAcknowledgment.acknowledged_at <= cursor_at,
+                or_(AlertAcknowledgment.acknowledged_at < cursor_at, AlertAcknowledgment.id < cursor_id)
+            )
+        
+        acknowledgments = query.order_by(
+            AlertAcknowledgment.acknowledged_at.desc(),
+            AlertAcknowledgment.id.desc()
+        ).limit(page_size + 1).all()
+        
+        has_more = len(acknowledgments) > page_size
+        acknowledgments = acknowledgments[:page_size]
+        
+        result['acknowledgments'] = [ack.to_dict() for ack in acknowledgments]
+        result['next_cursor'] = encode_cursor(acknowledgments[-1]) if has_more else None
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/export')
+def api_export():
+    """API: Stream the filtered history as CSV or NDJSON"""
+    export_format = request.args.get('format', 'csv').lower()
+    if export_format not in ('csv', 'ndjson'):
+        return jsonify({'error': f'Unsupported format: {export_format}'}), 400
+    
+    try:
+        query = filtered_history_query(request.args)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+    
+    # Plain column tuples streamed from a server-side cursor, in constant memory
+    rows = query.with_entities(*[getattr(AlertAcknowledgment, column) for column in EXPORT_COLUMNS]).order_by(
+        AlertAcknowledgment.acknowledged_at.desc(),
+        AlertAcknowledgment.id.desc()
+    ).execution_options(stream_results=True).yield_per(EXPORT_CHUNK_SIZE)
+    
+    if export_format == 'csv':
+        body, mimetype = stream_csv(rows), 'text/csv'
+    else:
+        body, mimetype = stream_ndjson(rows), 'application/x-ndjson'
+    
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=centreon_history.{export_format}'}
+    )
+
+# ===============================================
+# DASHBOARD PAYLOADS
+# ===============================================
+
+def stats_payload(buckets, since):
+    """General statistics from the rollup buckets of a window"""
+    total_acks = sum(bucket.count for bucket in buckets)
+    successful_acks = sum(bucket.count for bucket in buckets if bucket.success)
+    
+    success_rate = (successful_acks / total_acks * 100) if total_acks > 0 else 0
+    
+    response_time_count = sum(bucket.response_time_count for bucket in buckets)
+    avg_response_time = (sum(bucket.response_time_sum for bucket in buckets) / response_time_count
+                         if response_time_count else 0)
+    
+    percentiles = response_time_percentiles(since)
+    
+    return {
+        'last_24h': {
+            'total_acks': total_acks,
+            'successful_acks': successful_acks,
+            'failed_acks': total_acks - successful_acks,
+            'success_rate': round(success_rate, 2)
+        },
+        'performance': {
+            'avg_response_time': round(avg_response_time, 3),
+            'p50_response_time': percentiles[50],
+            'p95_response_time': percentiles[95],
+            'p99_response_time': percentiles[99]
+        }
+    }
+
+def hourly_payload(buckets):
+    """Chart.js data of acknowledgments per hour of day"""
+    hours = [f"{i:02d}:00" for i in range(24)]
+    successes = [0] * 24
+    failures = [0] * 24
+    
+    for bucket in buckets:
+        if bucket.success:
+            successes[bucket.hour.hour] += bucket.count
+        else:
+            failures[bucket.hour.hour] += bucket.count
+    
+    return {
+        'labels': hours,
+        'datasets': [
+            {
+                'label': 'Successful',
+                'data': successes,
+                'backgroundColor': 'rgba(40, 167, 69, 0.8)'
+            },
+            {
+                'label': 'Failed',
+                'data': failures,
+                'backgroundColor': 'rgba(220, 53, 69, 0.8)'
+            }
+        ]
+    }
+
+def status_payload(buckets):
+    """Chart.js data of acknowledgments per alert status"""
+    counts = {}
+    for bucket in buckets:
+        counts[bucket.status] = counts.get(bucket.status, 0) + bucket.count
+    
+    labels = []
+    data = []
+    colors = ['#ffc107', '#dc3545']
+    
+    for status in sorted(counts):
+        labels.append(status or 'UNKNOWN')
+        data.append(counts[status])
+    
+    return {
+        'labels': labels,
+        'datasets': [{
+            'data': data,
+            'backgroundColor': colors[:len(data)]
+        }]
+    }
+
+def recent_payload(limit):
+    """Latest acknowledgments"""
+    recent_acks = AlertAcknowledgment.query.order_by(
+        AlertAcknowledgment.acknowledged_at.desc()
+    ).limit(limit).all()
+    
+    return {
+        'acknowledgments': [ack.to_dict() for ack in recent_acks]
+    }
 
 # ===============================================
 # UTILITY FUNCTIONS
 # ===============================================
 
-def save_acknowledgment(service_id, host_id, service_name=None, host_name=None, 
-                       status=None, success=True, error_message=None, response_time=None):
-    """Save an acknowledgment to database"""
+EXPORT_COLUMNS = [
+    'id', 'acknowledged_at', 'service_id', 'service_name', 'host_id', 'host_name', 'status',
+    'success', 'response_time', 'connect_time', 'server_time', 'retry_count', 'error_message'
+]
+EXPORT_CHUNK_SIZE = 1000
+
+def filtered_history_query(args):
+    """AlertAcknowledgment query for the history filters of a request"""
+    start_date = args.get('start_date')
+    end_date = args.get('end_date')
+    status_filter = args.get('status', '').strip()
+    success_filter = args.get('success', '').strip()
+    
+    query = AlertAcknowledgment.query
+    
+    if start_date:
+        start_dt = datetime.strptime(start_date, '%Y-%m-%d')
+        query = query.filter(AlertAcknowledgment.acknowledged_at >= start_dt)
+    
+    if end_date:
+        end_dt = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
+        query = query.filter(AlertAcknowledgment.acknowledged_at < end_dt)
+    
+    if status_filter:
+        query = query.filter(AlertAcknowledgment.status == status_filter)
+    
+    if success_filter:
+        success_bool = success_filter.lower() == 'true'
+        query = query.filter(AlertAcknowledgment.success == success_bool)
+    
+    return query
+
+def archived_history_totals(args):
+    """
+    (count, successful, response_time_count, response_time_sum) of the
+    history filters over the days purged by the retention, from the daily
+    rollup. The filters are all rollup dimensions, so the totals are exact.
+    No query is sent unless the range starts before the retention cutoff.
+    """
+    cutoff = retention_cutoff()
+    start_date = args.get('start_date')
+    if cutoff is None or (start_date and datetime.strptime(start_date, '%Y-%m-%d') >= cutoff):
+        return 0, 0, 0, 0.0
+    
+    query = db.session.query(
+        func.coalesce(func.sum(DailyRollup.count), 0),
+        func.coalesce(func.sum(db.case([(DailyRollup.success == True, DailyRollup.count)], else_=0)), 0),
+        func.coalesce(func.sum(DailyRollup.response_time_count), 0),
+        func.coalesce(func.sum(DailyRollup.response_time_sum), 0.0)
+    )
+    if start_date:
+        query = query.filter(DailyRollup.day >= datetime.strptime(start_date, '%Y-%m-%d').date())
+    if args.get('end_date'):
+        query = query.filter(DailyRollup.day <= datetime.strptime(args['end_date'], '%Y-%m-%d').date())
+    status_filter = args.get('status', '').strip()
+    if status_filter:
+        query = query.filter(DailyRollup.status == status_filter)
+    success_filter = args.get('success', '').strip()
+    if success_filter:
+        query = query.filter(DailyRollup.success == (success_filter.lower() == 'true'))
+    return query.one()
+
+def stream_csv(rows):
+    """Yield CSV text, one chunk per EXPORT_CHUNK_SIZE rows"""
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(['' if value is None else value.isoformat() if isinstance(value, datetime) else value
+                         for value in row])
+        if count % EXPORT_CHUNK_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def stream_ndjson(rows):
+    """Yield one JSON document per line, in chunks of EXPORT_CHUNK_SIZE rows"""
+    lines = []
+    for row in rows:
+        record = dict(zip(EXPORT_COLUMNS, row))
+        if record['acknowledged_at']:
+            record['acknowledged_at'] = record['acknowledged_at'].isoformat()
+        lines.append(json.dumps(record))
+        if len(lines) >= EXPORT_CHUNK_SIZE:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+def encode_cursor(ack):
+    """Opaque history cursor pointing after a row"""
+    key = json.dumps([ack.acknowledged_at.isoformat(), ack.id])
+    return base64.urlsafe_b64encode(key.encode()).decode()
+
+def decode_cursor(cursor):
+    """Return (acknowledged_at, id) of a history cursor"""
+    acknowledged_at, ack_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return datetime.fromisoformat(acknowledged_at), int(ack_id)
+
+RollupBucket = namedtuple('RollupBucket', 'hour status success count response_time_count response_time_sum')
+
+def rollup_since(since):
+    """
+    Hourly buckets of acknowledgments since a date.
+    
+    Complete hours come from the rollup table; the first, partial hour is
+    aggregated from raw rows so the window starts exactly at since.
+    """
+    first_full_hour = truncate_hour(since) + timedelta(hours=1)
+    
+    complete = db.session.query(
+        HourlyRollup.hour,
+        HourlyRollup.status,
+        HourlyRollup.success,
+        HourlyRollup.count,
+        HourlyRollup.response_time_count,
+        HourlyRollup.response_time_sum
+    ).filter(HourlyRollup.hour >= first_full_hour)
+    
+    # Partial hour rows have a NULL hour, filled in below
+    partial = db.session.query(
+        null(),
+        func.coalesce(AlertAcknowledgment.status, ''),
+        AlertAcknowledgment.success,
+        func.count(AlertAcknowledgment.id),
+        func.count(AlertAcknowledgment.response_time),
+        func.coalesce(func.sum(AlertAcknowledgment.response_time), 0.0)
+    ).filter(
+        AlertAcknowledgment.acknowledged_at >= since,
+        AlertAcknowledgment.acknowledged_at < first_full_hour
+    ).group_by(AlertAcknowledgment.status, AlertAcknowledgment.success)
+    
+    return [
+        RollupBucket(hour or truncate_hour(since), *values)
+        for hour, *values in complete.union_all(partial)
+    ]
+
+def response_time_percentiles(since, percentiles=(50, 95, 99)):
+    """Nearest-rank response time percentiles since a date, None when no data"""
+    ranked = db.session.query(
+        AlertAcknowledgment.response_time.label('response_time'),
+        func.row_number().over(order_by=AlertAcknowledgment.response_time).label('rank'),
+        func.count().over().label('total')
+    ).filter(
+        AlertAcknowledgment.acknowledged_at >= since,
+        AlertAcknowledgment.response_time.isnot(None)
+    ).subquery()
+    
+    # Nearest rank ceil(p * n / 100), in integer arithmetic
+    rows = db.session.query(ranked.c.response_time, ranked.c.rank, ranked.c.total).filter(
+        ranked.c.rank.in_([(percentile * ranked.c.total + 99) / 100 for percentile in percentiles])
+    ).all()
+    
+    values = {row.rank: row.response_time for row in rows}
+    total = rows[0].total if rows else 0
+    return {
+        percentile: round(values[(percentile * total + 99) // 100], 3) if total else None
+        for percentile in percentiles
+    }
+
+def save_acknowledgment(*args, **kwargs):
+    """Save an acknowledgment to database, see recorder.save_acknowledgment()"""
+    ack_id = recorder.save_acknowledgment(*args, engine=db.engine, **kwargs)
+    if ack_id is not None:
+        response_cache.invalidate()
+        ack_broadcaster.notify()
+    return ack_id
+
+def save_acknowledgments(rows):
+    """Save many acknowledgments in one bulk insert, see recorder.save_acknowledgments()"""
+    written = recorder.save_acknowledgments(rows, engine=db.engine)
+    if written:
+        response_cache.invalidate()
+        ack_broadcaster.notify()
+    return written
+
+def init_database():
+    """Initialize database"""
+    recorder.init_database(db.engine)
+
+# ===============================================
+# RETENTION
+# ===============================================
+
+def retention_cutoff():
+    """Start of the oldest day kept as raw rows, None when retention is disabled"""
+    if app.config['RETENTION_DAYS'] <= 0:
+        return None
+    oldest = datetime.utcnow() - timedelta(days=app.config['RETENTION_DAYS'])
+    return oldest.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def archive_rows(path, rows):
+    """Append rows to a gzipped NDJSON archive and flush them to disk"""
+    with open(path, 'ab') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='ab') as archive:
+            for chunk in stream_ndjson(rows):
+                archive.write(chunk.encode('utf-8'))
+        raw.flush()
+        os.fsync(raw.fileno())
+
+def purge_history(cutoff):
+    """
+    Archive then delete raw rows older than cutoff, oldest first.
+    
+    Each chunk is its own short transaction, followed by a pause, so the
+    dashboard and the acknowledgment script keep writing in between.
+    Returns the number of rows deleted and the archive path.
+    """
+    table = AlertAcknowledgment.__table__
+    columns = [table.c[column] for column in EXPORT_COLUMNS]
+    path = None
+    deleted = 0
+    
+    while True:
+        rows = db.session.query(*columns).filter(table.c.acknowledged_at < cutoff).order_by(
+            table.c.acknowledged_at, table.c.id
+        ).limit(app.config['RETENTION_CHUNK_SIZE']).all()
+        if not rows:
+            break
+        
+        if path is None:
+            os.makedirs(app.config['ARCHIVE_DIR'], exist_ok=True)
+            path = os.path.join(app.config['ARCHIVE_DIR'],
+                                f"acknowledgments_{datetime.utcnow():%Y%m%dT%H%M%S}.ndjson.gz")
+        
+        # Rows are only deleted once they are safely archived
+        archive_rows(path, rows)
+        ids = [row.id for row in rows]
+        
+        def delete():
+            with db.engine.begin() as connection:
+                connection.execute(table.delete().where(table.c.id.in_(ids)))
+        
+        retry_on_lock(delete)
+        deleted += len(rows)
+        time.sleep(app.config['RETENTION_PAUSE'])
+    
+    return deleted, path
+
+def compact_rollup(cutoff):
+    """Move hourly buckets older than cutoff into the daily rollup, returns the number of buckets moved"""
+    buckets = HourlyRollup.query.filter(HourlyRollup.hour < cutoff).all()
+    if not buckets:
+        return 0
+    
+    totals = {}
+    for bucket in buckets:
+        total = totals.setdefault((bucket.hour.date(), bucket.status, bucket.success), [0, 0, 0.0])
+        total[0] += bucket.count
+        total[1] += bucket.response_time_count
+        total[2] += bucket.response_time_sum
+    
     try:
-        ack = AlertAcknowledgment(
-            service_id=str(service_id),
-            host_id=str(host_id),
-            service_name=service_name,
-            host_name=host_name,
-            status=status,
-            success=success,
-            error_message=error_message,
-            response_time=response_time
-        )
-        db.session.add(ack)
+        merge_rollup(db.session, DailyRollup.__table__, 'day', totals)
+        HourlyRollup.query.filter(HourlyRollup.hour < cutoff).delete()
         db.session.commit()
-        return ack.id
-    except Exception as e:
+    except Exception:
         db.session.rollback()
-        app.logger.error(f"Error saving acknowledgment: {e}")
+        raise
+    return len(buckets)
+
+def maintain_database():
+    """Refresh planner statistics, and VACUUM SQLite once enough pages are free. Returns True if vacuumed."""
+    with db.engine.begin() as connection:
+        connection.execute(text('ANALYZE'))
+    
+    if db.engine.dialect.name != 'sqlite':
+        return False
+    
+    with db.engine.connect() as connection:
+        page_count = connection.execute(text('PRAGMA page_count')).scalar()
+        free_pages = connection.execute(text('PRAGMA freelist_count')).scalar()
+    if not page_count or free_pages / page_count < app.config['VACUUM_FREE_RATIO']:
+        return False
+    
+    # VACUUM cannot run inside a transaction
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        connection.execute(text('VACUUM'))
+    return True
+
+def apply_retention():
+    """Purge, compact and maintain the database, returns a summary dict or None when disabled"""
+    cutoff = retention_cutoff()
+    if cutoff is None:
         return None
+    
+    deleted, archive = purge_history(cutoff)
+    compacted = compact_rollup(cutoff)
+    if deleted:
+        response_cache.invalidate()
+    vacuumed = maintain_database()
+    
+    summary = {
+        'cutoff': cutoff,
+        'deleted': deleted,
+        'archive': archive,
+        'compacted_buckets': compacted,
+        'vacuumed': vacuumed
+    }
+    app.logger.info(f"Retention applied: {summary}")
+    return summary
 
-def init_database():
-    """Initialize database"""
-    with app.app_context():
-        db.create_all()
-        print("Database initialized")
+def run_retention_worker():
+    """Apply the retention every RETENTION_INTERVAL hours, for the dashboard process"""
+    while True:
+        try:
+            with app.app_context():
+                apply_retention()
+                db.session.remove()
+        except Exception as e:
+            app.logger.error(f"Error applying retention: {e}")
+        time.sleep(app.config['RETENTION_INTERVAL'] * 3600)
+
+retention_thread = None
+retention_lock = threading.Lock()
+
+def start_retention_worker():
+    """Start the retention thread once per process, when RETENTION_DAYS is set"""
+    global retention_thread
+    if retention_cutoff() is None:
+        return
+    with retention_lock:
+        if retention_thread is None:
+            retention_thread = threading.Thread(target=run_retention_worker, name='retention', daemon=True)
+            retention_thread.start()
+
+@app.before_request
+def ensure_retention_worker():
+    """Under flask run or a WSGI server the module is imported, never run: start on the first request"""
+    if retention_thread is None:
+        start_retention_worker()
+
+# ===============================================
+# CLI COMMANDS
+# ===============================================
+
+# Requests covering every query shape of the dashboard APIs, with the
+# maximum number of SQL statements each one may issue
+EXPLAINED_ENDPOINTS = {
+    '/api/stats': 2,
+    '/api/charts/hourly': 1,
+    '/api/charts/status-distribution': 1,
+    '/api/recent-acks?limit=10': 1,
+    '/api/dashboard?recent=5': 3,
+    '/api/history?start_date={week_ago}&end_date={today}': 2,
+    '/api/history?start_date={week_ago}&end_date={today}&status=CRITICAL': 2,
+    '/api/history?start_date={week_ago}&end_date={today}&success=false': 2,
+    '/api/history?start_date={week_ago}&end_date={today}&cursor={cursor}': 1,
+}
+
+def capture_statements(url):
+    """Call a dashboard URL, returns its response and the (statement, parameters) it sent to the database"""
+    statements = []
+    
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+    
+    response_cache.invalidate()
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        response = app.test_client().get(url)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+    return response, statements
+
+def explained_urls():
+    today = datetime.utcnow().date()
+    week_ago = today - timedelta(days=7)
+    cursor = base64.urlsafe_b64encode(json.dumps([f'{today}T00:00:00', 2 ** 31]).encode()).decode()
+    return [(endpoint.format(today=today, week_ago=week_ago, cursor=cursor), budget)
+            for endpoint, budget in EXPLAINED_ENDPOINTS.items()]
+
+def explain_statement(statement, parameters):
+    """Query plan lines of one SQL statement, as reported by the database"""
+    prefix = 'EXPLAIN QUERY PLAN ' if db.engine.dialect.name == 'sqlite' else 'EXPLAIN '
+    connection = db.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(prefix + statement, parameters)
+        rows = cursor.fetchall()
+    finally:
+        connection.close()
+    # SQLite: (id, parent, notused, detail), others: one text column
+    return [str(row[-1]) for row in rows]
+
+def is_full_scan(plan_line):
+    """True when a query plan line reads the whole acknowledgment table"""
+    table = AlertAcknowledgment.__table__.name
+    if db.engine.dialect.name == 'sqlite':
+        return plan_line.startswith(f'SCAN {table}') and 'INDEX' not in plan_line
+    return f'Seq Scan on {table}' in plan_line
+
+def backend_check_rows(now):
+    """Deterministic acknowledgments for check-backend, spread over the last 3 days"""
+    statuses = ['WARNING', 'CRITICAL', None]
+    return [{
+        'acknowledged_at': now - timedelta(minutes=37 * i + 1),
+        'service_id': str(i),
+        'host_id': str(i % 7),
+        'service_name': f'service-{i}',
+        'host_name': f'host-{i % 7}',
+        'status': statuses[i % 3],
+        'success': i % 5 != 0,
+        'response_time': None if i % 11 == 0 else round(0.01 * (i % 97) + 0.005, 3),
+        'connect_time': 0.001,
+        'server_time': 0.002
+    } for i in range(120)]
+
+def run_backend_checks(rows, now):
+    """Compare every dashboard API with values computed in Python from rows, yields (name, ok, detail)"""
+    client = app.test_client()
+    window = [row for row in rows if row['acknowledged_at'] >= now - timedelta(days=1)]
+    
+    stats = client.get('/api/stats').get_json()['last_24h']
+    expected = (len(window), sum(row['success'] for row in window))
+    yield 'stats totals', (stats['total_acks'], stats['successful_acks']) == expected, f"{stats} vs {expected}"
+    
+    times = sorted(row['response_time'] for row in window if row['response_time'] is not None)
+    performance = client.get('/api/stats').get_json()['performance']
+    expected = [round(times[(p * len(times) + 99) // 100 - 1], 3) for p in (50, 95, 99)]
+    actual = [performance[f'p{p}_response_time'] for p in (50, 95, 99)]
+    yield 'stats percentiles', actual == expected, f"{actual} vs {expected}"
+    
+    successes, failures = [0] * 24, [0] * 24
+    for row in window:
+        (successes if row['success'] else failures)[row['acknowledged_at'].hour] += 1
+    datasets = client.get('/api/charts/hourly').get_json()['datasets']
+    yield 'hourly buckets', [datasets[0]['data'], datasets[1]['data']] == [successes, failures], ''
+    
+    counts = {}
+    for row in window:
+        counts[row['status'] or 'UNKNOWN'] = counts.get(row['status'] or 'UNKNOWN', 0) + 1
+    distribution = client.get('/api/charts/status-distribution').get_json()
+    actual = dict(zip(distribution['labels'], distribution['datasets'][0]['data']))
+    yield 'status distribution', actual == counts, f"{actual} vs {counts}"
+    
+    start = (now - timedelta(days=2)).date()
+    expected = sorted((row for row in rows if row['acknowledged_at'].date() >= start),
+                      key=lambda row: row['acknowledged_at'], reverse=True)
+    seen, cursor = [], None
+    while True:
+        page = client.get(f'/api/history?start_date={start}&limit=7' + (f'&cursor={cursor}' if cursor else '')).get_json()
+        seen += [ack['service_id'] for ack in page['acknowledgments']]
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+    yield 'history pages', seen == [row['service_id'] for row in expected], f"{len(seen)} vs {len(expected)} rows"
+    
+    exported = client.get(f'/api/export?start_date={start}&format=ndjson').get_data(as_text=True).splitlines()
+    yield 'export', len(exported) == len(expected), f"{len(exported)} vs {len(expected)} rows"
+    
+    before = {(bucket.hour, bucket.status, bucket.success): bucket.count for bucket in HourlyRollup.query}
+    rebuild_rollup(db.engine)
+    after = {(bucket.hour, bucket.status, bucket.success): bucket.count for bucket in HourlyRollup.query}
+    yield 'rollup rebuild', before == after, f"{len(before)} vs {len(after)} buckets"
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create missing tables, add new columns and indexes, build the rollup of an existing history."""
+    init_database()
+
+@app.cli.command('rebuild-rollup')
+def rebuild_rollup_command():
+    """Regenerate the hourly rollup table from raw acknowledgments."""
+    read = rebuild_rollup(db.engine, retention_cutoff())
+    click.echo(f"Rollup rebuilt from {read} acknowledgments ({HourlyRollup.query.count()} buckets)")
+
+@app.cli.command('apply-retention')
+def apply_retention_command():
+    """Archive and delete raw acknowledgments past RETENTION_DAYS, then compact the database."""
+    summary = apply_retention()
+    if summary is None:
+        raise click.ClickException('Retention is disabled, set RETENTION_DAYS')
+    click.echo(f"Rows older than {summary['cutoff']:%Y-%m-%d}: {summary['deleted']} deleted"
+               + (f", archived to {summary['archive']}" if summary['archive'] else ''))
+    click.echo(f"Hourly buckets compacted into the daily rollup: {summary['compacted_buckets']}")
+    click.echo(f"VACUUM: {'done' if summary['vacuumed'] else 'not needed'}")
+
+@app.cli.command('explain-queries')
+@click.option('--fail-on-scan', is_flag=True, help='Exit with an error if a query scans the whole table.')
+def explain_queries(fail_on_scan):
+    """Print the query plan of every SQL statement issued by the dashboard APIs."""
+    full_scans = 0
+    for url, _ in explained_urls():
+        _, statements = capture_statements(url)
+        click.echo(f"== {url} ({len(statements)} statements)")
+        for statement, parameters in statements:
+            click.echo('   ' + ' '.join(statement.split()))
+            for line in explain_statement(statement, parameters):
+                scan = is_full_scan(line)
+                full_scans += scan
+                click.echo(f"     {'!! ' if scan else '-> '}{line}")
+        click.echo()
+    
+    click.echo(f"{full_scans} full table scans")
+    if fail_on_scan and full_scans:
+        raise SystemExit(1)
+
+@app.cli.command('check-query-counts')
+def check_query_counts():
+    """Fail if a dashboard API issues more SQL statements than its budget."""
+    over_budget = 0
+    for url, budget in explained_urls():
+        response, statements = capture_statements(url)
+        failed = len(statements) > budget or response.status_code != 200
+        over_budget += failed
+        click.echo(f"{'FAIL' if failed else 'ok  '} {len(statements)}/{budget} statements  "
+                   f"HTTP {response.status_code}  {url}")
+    
+    if over_budget:
+        raise SystemExit(1)
+
+@app.cli.command('check-backend')
+def check_backend():
+    """Write known acknowledgments to an empty database and check every API against them."""
+    if AlertAcknowledgment.query.first() is not None:
+        raise click.ClickException('The database already holds acknowledgments, point DATABASE_URL to an empty one')
+    
+    click.echo(f"Backend: {db.engine.dialect.name} ({db.engine.url.render_as_string(hide_password=True)})")
+    now = datetime.utcnow()
+    rows = backend_check_rows(now)
+    failures = 0
+    try:
+        if save_acknowledgments(rows) != len(rows):
+            raise click.ClickException('Bulk insert failed')
+        save_acknowledgment(999, 999, status='WARNING', response_time=None)
+        rows.append({'acknowledged_at': now, 'service_id': '999', 'status': 'WARNING',
+                     'success': True, 'response_time': None})
+        
+        for name, ok, detail in run_backend_checks(rows, datetime.utcnow()):
+            failures += not ok
+            click.echo(f"{'ok  ' if ok else 'FAIL'} {name}" + ('' if ok else f"  {detail}"))
+    finally:
+        for model in (AlertAcknowledgment, HourlyRollup, DailyRollup):
+            model.query.delete()
+        db.session.commit()
+    
+    if failures:
+        raise SystemExit(1)
 
 # ===============================================
 # INITIALIZATION
@@ -750,8 +1670,13 @@ if __name__ == '__main__':
     print("  - Real-time dashboard with metrics")
     print("  - History page with filters")
     print("  - CSV export functionality")
-    print("  - Auto-refresh every 30s")
+    print("  - Live updates over SSE")
+    if retention_cutoff():
+        print(f"  - Retention of raw history: {app.config['RETENTION_DAYS']} days")
     print("=" * 50)
     
+    # Periodic retention and compaction
+    start_retention_worker()
+    
     # Launch application
     app.run(debug=False, host='0.0.0.0', port=port)
\ No newline at end of file
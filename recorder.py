@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Acknowledgment recorder
+Tables and write path of the dashboard database, without Flask
+Used by the acknowledgment script to save its results, and by the dashboard models
+"""
+
+import logging
+import os
+import random
+import sqlite3
+import time
+from datetime import datetime
+from dotenv import load_dotenv
+from sqlalchemy import (MetaData, Table, Column, Index, Integer, String, Text, Float, Boolean, DateTime, Date,
+                        and_, create_engine, event, inspect, select, text)
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import OperationalError
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# ===============================================
+# CONFIGURATION
+# ===============================================
+
+DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///centreon_dashboard.db')
+
+# SQLite connection pragmas, an empty value keeps the SQLite default
+SQLITE_PRAGMAS = {
+    'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'busy_timeout': os.getenv('SQLITE_BUSY_TIMEOUT', '5000'),
+    'cache_size': os.getenv('SQLITE_CACHE_SIZE', '-20000'),
+    'mmap_size': os.getenv('SQLITE_MMAP_SIZE', '268435456')
+}
+
+# Writes retried while the database is locked
+DB_WRITE_RETRIES = int(os.getenv('DB_WRITE_RETRIES', 3))
+DB_WRITE_BACKOFF = float(os.getenv('DB_WRITE_BACKOFF', 0.1))
+
+def engine_options(url=DATABASE_URL):
+    """create_engine() options of the connection pool, size settings only apply to client/server databases"""
+    options = {
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'True').lower() == 'true',
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800))
+    }
+    if not url.startswith('sqlite'):
+        options.update(
+            pool_size=int(os.getenv('DB_POOL_SIZE', 5)),
+            max_overflow=int(os.getenv('DB_MAX_OVERFLOW', 10)),
+            pool_timeout=int(os.getenv('DB_POOL_TIMEOUT', 30))
+        )
+    return options
+
+@event.listens_for(Engine, 'connect')
+def configure_sqlite(dbapi_connection, connection_record):
+    """Apply SQLITE_PRAGMAS to every new SQLite connection"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    for pragma, value in SQLITE_PRAGMAS.items():
+        if value:
+            cursor.execute(f"PRAGMA {pragma} = {value}")
+    cursor.close()
+
+# ===============================================
+# TABLES
+# ===============================================
+
+metadata = MetaData()
+
+acknowledgments = Table(
+    'alert_acknowledgment', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('service_id', String(50), nullable=False),
+    Column('host_id', String(50), nullable=False),
+    Column('service_name', String(200)),
+    Column('host_name', String(200)),
+    Column('status', String(20)),
+    Column('acknowledged_at', DateTime, default=datetime.utcnow),
+    Column('success', Boolean, default=True),
+    Column('error_message', Text),
+    Column('response_time', Float),
+    Column('connect_time', Float),
+    Column('server_time', Float),
+    # Requests sent again after a timeout, connection error or 502/503/504
+    Column('retry_count', Integer, default=0),
+    # Time range scans of every dashboard API, covering the 24h aggregates
+    Index('ix_alert_ack_time_covering', 'acknowledged_at', 'success', 'status', 'response_time'),
+    # History filtered by status or by result
+    Index('ix_alert_ack_status_time', 'status', 'acknowledged_at'),
+    Index('ix_alert_ack_success_time', 'success', 'acknowledged_at'),
+    # Keyset pagination order of the history
+    Index('ix_alert_ack_time_id', 'acknowledged_at', 'id')
+)
+
+# Acknowledgment counts per hour, status and result, maintained on write
+hourly_rollup = Table(
+    'acknowledgment_hourly_rollup', metadata,
+    Column('hour', DateTime, primary_key=True),
+    Column('status', String(20), primary_key=True, default=''),
+    Column('success', Boolean, primary_key=True),
+    Column('count', Integer, nullable=False, default=0),
+    Column('response_time_count', Integer, nullable=False, default=0),
+    Column('response_time_sum', Float, nullable=False, default=0.0)
+)
+
+# Acknowledgment counts per day, status and result, for hours past the retention period
+daily_rollup = Table(
+    'acknowledgment_daily_rollup', metadata,
+    Column('day', Date, primary_key=True),
+    Column('status', String(20), primary_key=True, default=''),
+    Column('success', Boolean, primary_key=True),
+    Column('count', Integer, nullable=False, default=0),
+    Column('response_time_count', Integer, nullable=False, default=0),
+    Column('response_time_sum', Float, nullable=False, default=0.0)
+)
+
+# ===============================================
+# ENGINE
+# ===============================================
+
+_engine = None
+
+def database_url(url=DATABASE_URL):
+    """URL with a relative SQLite path resolved from this directory, like Flask-SQLAlchemy does"""
+    url = make_url(url)
+    if url.drivername.startswith('sqlite') and url.database not in (None, '', ':memory:') \
+            and not os.path.isabs(url.database):
+        url = url.set(database=os.path.join(os.path.dirname(os.path.abspath(__file__)), url.database))
+    return url
+
+def get_engine():
+    """Engine of DATABASE_URL, created on first use"""
+    global _engine
+    if _engine is None:
+        _engine = create_engine(database_url(), **engine_options())
+    return _engine
+
+# ===============================================
+# ROLLUP
+# ===============================================
+
+def truncate_hour(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+def aggregate_rollup(rows):
+    """Rollup increments {(hour, status, success): [count, rt_count, rt_sum]} for raw rows"""
+    totals = {}
+    for row in rows:
+        key = (truncate_hour(row['acknowledged_at']), row.get('status') or '', bool(row.get('success', True)))
+        total = totals.setdefault(key, [0, 0, 0.0])
+        total[0] += 1
+        if row.get('response_time') is not None:
+            total[1] += 1
+            total[2] += row['response_time']
+    return totals
+
+def merge_rollup(connection, table, period, totals):
+    """Add {(period, status, success): [count, rt_count, rt_sum]} to a rollup table, within the caller's transaction"""
+    for (start, status, success), (count, rt_count, rt_sum) in totals.items():
+        result = connection.execute(
+            table.update().where(and_(
+                table.c[period] == start,
+                table.c.status == status,
+                table.c.success == success
+            )).values(
+                count=table.c.count + count,
+                response_time_count=table.c.response_time_count + rt_count,
+                response_time_sum=table.c.response_time_sum + rt_sum
+            )
+        )
+        if result.rowcount == 0:
+            connection.execute(table.insert().values({
+                period: start, 'status': status, 'success': success, 'count': count,
+                'response_time_count': rt_count, 'response_time_sum': rt_sum
+            }))
+
+def update_rollup(connection, rows):
+    """Add raw rows to the hourly rollup, within the caller's transaction"""
+    merge_rollup(connection, hourly_rollup, 'hour', aggregate_rollup(rows))
+
+def rebuild_rollup(engine=None, since=None):
+    """
+    Regenerate the hourly rollup from raw rows, returns the number of rows read.
+
+    With since, only hours from that date are rebuilt: older buckets are the
+    only record left of rows removed by the retention.
+    """
+    query = select(
+        acknowledgments.c.acknowledged_at, acknowledgments.c.status,
+        acknowledgments.c.success, acknowledgments.c.response_time
+    ).where(acknowledgments.c.acknowledged_at.isnot(None))
+    if since:
+        query = query.where(acknowledgments.c.acknowledged_at >= since)
+
+    with (engine or get_engine()).begin() as connection:
+        rows = connection.execution_options(stream_results=True, yield_per=10000).execute(query)
+        totals = aggregate_rollup(rows.mappings())
+
+        stale = hourly_rollup.delete()
+        if since:
+            stale = stale.where(hourly_rollup.c.hour >= since)
+        connection.execute(stale)
+        if totals:
+            connection.execute(hourly_rollup.insert(), [
+                {'hour': hour, 'status': status, 'success': success, 'count': count,
+                 'response_time_count': rt_count, 'response_time_sum': rt_sum}
+                for (hour, status, success), (count, rt_count, rt_sum) in totals.items()
+            ])
+    return sum(count for count, _, _ in totals.values())
+
+# ===============================================
+# WRITES
+# ===============================================
+
+def is_lock_error(error):
+    """True for the SQLite errors raised when another connection holds the write lock"""
+    message = str(error.orig if isinstance(error, OperationalError) else error).lower()
+    return 'database is locked' in message or 'database is busy' in message
+
+def retry_on_lock(write):
+    """
+    Run a write transaction, retried with jittered exponential backoff while
+    the database is locked. write must do everything from the first
+    statement to the commit, it is replayed from scratch on each attempt.
+    """
+    for attempt in range(DB_WRITE_RETRIES + 1):
+        try:
+            return write()
+        except OperationalError as e:
+            if attempt == DB_WRITE_RETRIES or not is_lock_error(e):
+                raise
+            delay = DB_WRITE_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5)
+            logger.warning(f"Database locked, retrying write in {delay:.2f}s ({attempt + 1}/{DB_WRITE_RETRIES})")
+            time.sleep(delay)
+
+def save_acknowledgment(service_id, host_id, service_name=None, host_name=None,
+                        status=None, success=True, error_message=None, response_time=None,
+                        connect_time=None, server_time=None, retry_count=0, engine=None):
+    """Save one acknowledgment, returns its id or None if it could not be written"""
+    row = {
+        'acknowledged_at': datetime.utcnow(),
+        'service_id': str(service_id),
+        'host_id': str(host_id),
+        'service_name': service_name,
+        'host_name': host_name,
+        'status': status,
+        'success': success,
+        'error_message': error_message,
+        'response_time': response_time,
+        'connect_time': connect_time,
+        'server_time': server_time,
+        'retry_count': retry_count
+    }
+
+    def write():
+        with (engine or get_engine()).begin() as connection:
+            result = connection.execute(acknowledgments.insert().values(row))
+            update_rollup(connection, [row])
+            return result.inserted_primary_key[0]
+
+    try:
+        return retry_on_lock(write)
+    except Exception as e:
+        logger.error(f"Error saving acknowledgment: {e}")
+        return None
+
+def save_acknowledgments(rows, engine=None):
+    """
+    Save many acknowledgments in one bulk insert.
+
+    Rows are dicts of acknowledgment columns. Returns the number of rows
+    written, or None if the transaction failed and was rolled back.
+    """
+    if not rows:
+        return 0
+
+    def write():
+        with (engine or get_engine()).begin() as connection:
+            connection.execute(acknowledgments.insert(), rows)
+            update_rollup(connection, rows)
+            return len(rows)
+
+    try:
+        return retry_on_lock(write)
+    except Exception as e:
+        logger.error(f"Error saving {len(rows)} acknowledgments: {e}")
+        return None
+
+# ===============================================
+# SCHEMA
+# ===============================================
+
+def upgrade_database(engine, new_tables=()):
+    """Add columns and indexes introduced after the table was created"""
+    inspector = inspect(engine)
+    columns = {column['name'] for column in inspector.get_columns(acknowledgments.name)}
+    for column in acknowledgments.columns:
+        if column.name not in columns:
+            column_type = column.type.compile(dialect=engine.dialect)
+            with engine.begin() as connection:
+                connection.execute(text(
+                    f'ALTER TABLE {acknowledgments.name} ADD COLUMN {column.name} {column_type}'
+                ))
+            print(f"Database upgraded: added column {column.name}")
+
+    indexes = {index['name'] for index in inspector.get_indexes(acknowledgments.name)}
+    created = False
+    for index in acknowledgments.indexes:
+        if index.name not in indexes:
+            index.create(bind=engine)
+            created = True
+            print(f"Database upgraded: created index {index.name}")
+
+    # Planner statistics, so the new indexes are used for range scans
+    if created:
+        with engine.begin() as connection:
+            connection.execute(text('ANALYZE'))
+
+    # Rollup table added to a database that already has history
+    if hourly_rollup.name in new_tables:
+        with engine.connect() as connection:
+            has_history = connection.execute(select(acknowledgments.c.id).limit(1)).first() is not None
+        if has_history:
+            print(f"Database upgraded: rollup built from {rebuild_rollup(engine)} acknowledgments")
+
+def ensure_tables(engine=None):
+    """
+    Cheap startup check for writers: create the tables of an empty
+    database, and only warn when an existing one needs an upgrade. Tables
+    are never added to a database with history here, so init_database()
+    still sees them as new and builds the rollup from the history.
+    Returns True if the schema is current.
+    """
+    engine = engine or get_engine()
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    if not existing_tables & set(metadata.tables):
+        metadata.create_all(engine)
+        return True
+    
+    columns = {column['name'] for column in inspector.get_columns(acknowledgments.name)} \
+        if acknowledgments.name in existing_tables else set()
+    if set(metadata.tables) - existing_tables or set(acknowledgments.columns.keys()) - columns:
+        logger.warning("Dashboard database schema is outdated, run: FLASK_APP=dashboard.py flask init-db")
+        return False
+    return True
+
+def init_database(engine=None):
+    """Create missing tables, then upgrade the existing ones"""
+    engine = engine or get_engine()
+    existing_tables = set(inspect(engine).get_table_names())
+    metadata.create_all(engine)
+    upgrade_database(engine, new_tables=set(metadata.tables) - existing_tables)
+    print("Database initialized")
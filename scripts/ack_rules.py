@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Acknowledgment rules
+Select which alerts are acknowledged, and with which comment, from a JSON rules file
+Rules are compiled once into an index: exact host and service names in hash tables,
+every other rule in one combined regex
+"""
+
+import json
+import re
+
+# Fields of the match key are separated by NUL, hostgroups by SOH: neither appears in Centreon names
+SEPARATOR = '\x00'
+GROUP_SEPARATOR = '\x01'
+NAME_CHAR = r'[^\x00]'
+GROUP_CHAR = r'[^\x00\x01]'
+
+ACTIONS = ('ack', 'skip')
+MATCH_KEYS = {'host', 'service', 'status', 'hostgroup'}
+RULE_KEYS = MATCH_KEYS | {'name', 'action', 'comment'}
+# Placeholders available in comment templates
+TEMPLATE_FIELDS = ('host_name', 'service_name', 'status', 'host_id', 'service_id', 'rule')
+
+class RulesError(ValueError):
+    """Invalid rules file"""
+
+# ===============================================
+# PATTERNS
+# ===============================================
+
+def literal_prefix(item):
+    """Text every name matched by a glob or 're:' pattern starts with, possibly empty"""
+    if not item.startswith('re:'):
+        return re.split(r'[*?]', item, maxsplit=1)[0]
+    source = item[3:].lstrip('^')
+    # Alternatives or a quantifier on the last literal character make the prefix optional
+    if '|' in source:
+        return ''
+    end = 0
+    while end < len(source) and source[end] not in '.^$*+?{}[]\\|()':
+        end += 1
+    if end < len(source) and source[end] in '*+?{':
+        end -= 1
+    return source[:max(end, 0)]
+
+def parse_pattern(value, field, char=NAME_CHAR):
+    """
+    Regex source, 're:' regexes, exact names and literal prefixes of a host, service or hostgroup condition.
+    
+    value is a name, a glob (* and ?), 're:' followed by a regex matching
+    the whole name, or a list of those. Returns (source, regexes, names, prefixes):
+    source matches the names and globs, None if there are only regexes;
+    regexes are the compiled 're:' entries, each matched alone against the name;
+    names is the set of exact names, None if any entry is a pattern;
+    prefixes lists the literal start of every entry, None if one has none.
+    """
+    if value is None:
+        return None, [], None, None
+    values = value if isinstance(value, list) else [value]
+    if not values or not all(isinstance(item, str) and item for item in values):
+        raise RulesError(f"{field}: expected a name, a pattern or a list of them")
+    
+    sources = []
+    regexes = []
+    names = set()
+    prefixes = []
+    for item in values:
+        if item.startswith('re:'):
+            try:
+                regexes.append(re.compile(item[3:]))
+            except re.error as e:
+                raise RulesError(f"{field}: invalid regex {item[3:]!r} ({e})")
+            names = None
+            prefix = literal_prefix(item)
+        elif '*' in item or '?' in item:
+            sources.append(''.join(
+                f'{char}*' if c == '*' else char if c == '?' else re.escape(c) for c in item
+            ))
+            names = None
+            prefix = literal_prefix(item)
+        else:
+            sources.append(re.escape(item))
+            if names is not None:
+                names.add(item)
+            prefix = item
+        if prefixes is not None:
+            prefixes = prefixes + [prefix] if prefix else None
+    source = '|'.join(f'(?:{source})' for source in sources) if sources else None
+    return source, regexes, names, prefixes
+
+def match_key(service):
+    """String matched by the rules: host, service, status and hostgroups of an alert"""
+    groups = GROUP_SEPARATOR.join(service.get('hostgroups') or ())
+    return SEPARATOR.join((
+        service.get('host_name') or '',
+        service.get('service_name') or '',
+        service.get('status') or '',
+        f"{GROUP_SEPARATOR}{groups}{GROUP_SEPARATOR}"
+    ))
+
+# ===============================================
+# RULES
+# ===============================================
+
+class Rule:
+    """One rule of the file, compiled into a regex over match_key() and checks of its 're:' fields"""
+    
+    def __init__(self, index, spec, default_comment):
+        if not isinstance(spec, dict):
+            raise RulesError(f"rule {index + 1}: expected an object")
+        unknown = set(spec) - RULE_KEYS
+        if unknown:
+            raise RulesError(f"rule {index + 1}: unknown keys {', '.join(sorted(unknown))}")
+        
+        self.index = index
+        self.name = str(spec.get('name') or f"rule {index + 1}")
+        self.action = spec.get('action', 'ack')
+        if self.action not in ACTIONS:
+            raise RulesError(f"{self.name}: action must be one of {', '.join(ACTIONS)}")
+        self.comment = spec.get('comment', default_comment)
+        if not isinstance(self.comment, str) or not self.comment:
+            raise RulesError(f"{self.name}: comment must be a non-empty string")
+        try:
+            self.comment.format_map(dict.fromkeys(TEMPLATE_FIELDS, ''))
+        except (KeyError, ValueError, IndexError, AttributeError, TypeError) as e:
+            raise RulesError(f"{self.name}: invalid comment template ({e!r}), "
+                             f"placeholders are {', '.join(TEMPLATE_FIELDS)}")
+        
+        host = parse_pattern(spec.get('host'), f"{self.name}: host")
+        service = parse_pattern(spec.get('service'), f"{self.name}: service")
+        hostgroup = parse_pattern(spec.get('hostgroup'), f"{self.name}: hostgroup", GROUP_CHAR)
+        _, _, self.hosts, self.host_prefixes = host
+        _, _, self.services, self.service_prefixes = service
+        statuses = spec.get('status')
+        if statuses is not None:
+            statuses = statuses if isinstance(statuses, list) else [statuses]
+            if not statuses or not all(isinstance(status, str) and status for status in statuses):
+                raise RulesError(f"{self.name}: status must be a status name or a list of them")
+        status = '|'.join(re.escape(status.upper()) for status in statuses) if statuses else None
+        
+        # 're:' regexes are user regexes: anchors, inline flags or '.' would break inside the
+        # key regex, so a field with one is left open there and checked on its own value
+        self.checks = []
+        try:
+            host = self.field_source(host, 'host_name')
+            service = self.field_source(service, 'service_name')
+            hostgroup = self.field_source(hostgroup, 'hostgroups')
+            group_field = f'{NAME_CHAR}*\\x01(?:{hostgroup})\\x01{NAME_CHAR}*' if hostgroup else f'{NAME_CHAR}*'
+            self.source = '\\x00'.join([
+                f'(?:{host})' if host else f'{NAME_CHAR}*',
+                f'(?:{service})' if service else f'{NAME_CHAR}*',
+                f'(?:{status})' if status else f'{NAME_CHAR}*',
+                group_field
+            ])
+            self.regex = re.compile(self.source)
+        except re.error as e:
+            raise RulesError(f"{self.name}: invalid pattern ({e})")
+    
+    def field_source(self, pattern, field):
+        """Source of a field in the key regex, None if the field is checked on its own"""
+        source, regexes, _, _ = pattern
+        if not regexes:
+            return source
+        self.checks.append((field, ([re.compile(source)] if source else []) + regexes))
+        return None
+    
+    def matches(self, key, service):
+        """Whether the rule matches a service, key being its match_key()"""
+        if self.regex.fullmatch(key) is None:
+            return False
+        for field, regexes in self.checks:
+            if field == 'hostgroups':
+                values = service.get('hostgroups') or ()
+            else:
+                values = (service.get(field) or '',)
+            if not any(regex.fullmatch(value) for value in values for regex in regexes):
+                return False
+        return True
+    
+    def render(self, service):
+        """Comment of an acknowledgment made by this rule"""
+        values = {field: str(service.get(field) or '') for field in TEMPLATE_FIELDS}
+        values['rule'] = self.name
+        return self.comment.format_map(values)
+
+class RuleSet:
+    """
+    Rules compiled for lookup, the first matching rule in file order wins.
+    
+    Each rule is indexed by the most selective of: its exact host names,
+    the literal prefix of its host patterns ("web-" for "web-*"), its
+    exact service names, the literal prefix of its service patterns. A
+    lookup only checks the rules found under the alert's names and their
+    prefixes. Rules with none of those are alternatives of one combined
+    regex, tried in file order by the regex engine: its first full match
+    is the first candidate among them, confirmed by the rule's 're:'
+    checks. Alerts matching no rule get the default rule, if any.
+    """
+    
+    def __init__(self, rules, default=None):
+        self.rules = rules
+        self.default = default
+        self.by_host = {}
+        self.by_host_prefix = {}
+        self.by_service = {}
+        self.by_service_prefix = {}
+        self.pattern_rules = []
+        for rule in rules:
+            for table, keys in ((self.by_host, rule.hosts), (self.by_host_prefix, rule.host_prefixes),
+                                (self.by_service, rule.services), (self.by_service_prefix, rule.service_prefixes)):
+                if keys:
+                    for key in keys:
+                        table.setdefault(key, []).append(rule)
+                    break
+            else:
+                self.pattern_rules.append(rule)
+        self.host_prefix_lengths = sorted({len(prefix) for prefix in self.by_host_prefix})
+        self.service_prefix_lengths = sorted({len(prefix) for prefix in self.by_service_prefix})
+        
+        # Group number of each alternative, after the groups of the regexes before it,
+        # mapped to the position of its rule in pattern_rules
+        self.group_rules = {}
+        group = 1
+        for position, rule in enumerate(self.pattern_rules):
+            self.group_rules[group] = position
+            group += 1 + rule.regex.groups
+        try:
+            self.combined = re.compile('|'.join(f'({rule.source})' for rule in self.pattern_rules)) \
+                if self.pattern_rules else None
+        except re.error as e:
+            raise RulesError(f"rules cannot be combined ({e})")
+        
+        self.counts = {'ack': 0, 'skip': 0, 'unmatched': 0}
+    
+    def __len__(self):
+        return len(self.rules)
+    
+    def match(self, service):
+        """First rule matching a service dict (host_name, service_name, status, hostgroups), or None"""
+        key = match_key(service)
+        host = service.get('host_name') or ''
+        name = service.get('service_name') or ''
+        buckets = [self.by_host.get(host), self.by_service.get(name)]
+        for lengths, prefixes, value in ((self.host_prefix_lengths, self.by_host_prefix, host),
+                                         (self.service_prefix_lengths, self.by_service_prefix, name)):
+            for length in lengths:
+                if length > len(value):
+                    break
+                buckets.append(prefixes.get(value[:length]))
+        
+        # Buckets are in file order: each is scanned up to its first match or the best rule so far
+        best = None
+        for bucket in buckets:
+            for rule in bucket or ():
+                if best is not None and rule.index >= best.index:
+                    break
+                if rule.matches(key, service):
+                    best = rule
+                    break
+        
+        # The combined regex skips the rules it cannot match; a rule whose 're:' checks
+        # fail hands over to the pattern rules after it
+        if self.combined is not None and (best is None or best.index > self.pattern_rules[0].index):
+            found = self.combined.fullmatch(key)
+            if found:
+                for rule in self.pattern_rules[self.group_rules[found.lastindex]:]:
+                    if best is not None and rule.index >= best.index:
+                        break
+                    if rule.matches(key, service):
+                        best = rule
+                        break
+        return best
+    
+    def comment_for(self, service):
+        """Comment to acknowledge a service with, None if the rules leave it unacknowledged"""
+        rule = self.match(service) or self.default
+        if rule is None:
+            self.counts['unmatched'] += 1
+            return None
+        self.counts[rule.action] += 1
+        return rule.render(service) if rule.action == 'ack' else None
+    
+    def stats(self):
+        return dict(self.counts, rules=len(self.rules), indexed=len(self.rules) - len(self.pattern_rules))
+
+# ===============================================
+# LOADING
+# ===============================================
+
+def compile_rules(data, default_comment):
+    """
+    RuleSet of a parsed rules file.
+    
+    The file holds a list of rules, or an object with "rules", an optional
+    "comment" used by rules without one, and an optional "default" rule
+    applied to alerts matching no rule (left unacknowledged without it),
+    with an action and a comment but no conditions.
+    """
+    if isinstance(data, list):
+        data = {'rules': data}
+    if not isinstance(data, dict) or not isinstance(data.get('rules'), list):
+        raise RulesError('expected a list of rules, or an object with a "rules" list')
+    unknown = set(data) - {'rules', 'comment', 'default'}
+    if unknown:
+        raise RulesError(f"unknown keys {', '.join(sorted(unknown))}")
+    
+    comment = data.get('comment', default_comment)
+    rules = [Rule(index, spec, comment) for index, spec in enumerate(data['rules'])]
+    default = None
+    if data.get('default') is not None:
+        if not isinstance(data['default'], dict):
+            raise RulesError('default: expected a rule object')
+        # The default rule applies to every unmatched alert, conditions would look scoped but be ignored
+        scoped = MATCH_KEYS & set(data['default'])
+        if scoped:
+            raise RulesError(f"default: only action and comment are allowed, not {', '.join(sorted(scoped))}")
+        default = Rule(len(rules), dict(data['default'], name='default'), comment)
+    return RuleSet(rules, default)
+
+def load_rules(path, default_comment):
+    """Read and compile a rules file, raises RulesError with the reason if it is invalid"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    except OSError as e:
+        raise RulesError(f"cannot read {path}: {e}")
+    except ValueError as e:
+        raise RulesError(f"{path} is not valid JSON: {e}")
+    return compile_rules(data, default_comment)
@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the acknowledgment script and the dashboard
+Each subcommand prints its measurements, run with --help for the options
+"""
+
+import argparse
+import ast
+import json
+import os
+import random
+import re
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# ===============================================
+# HELPERS
+# ===============================================
+
+def percentile(values, p):
+    """Nearest-rank percentile, None for an empty list"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, (p * len(ordered) + 99) // 100 - 1)]
+
+def ms(seconds):
+    return '-' if seconds is None else f"{seconds * 1000:.1f}"
+
+def worker_command(command, *args):
+    return [sys.executable, os.path.abspath(__file__), command, *map(str, args)]
+
+# ===============================================
+# SQLITE CONCURRENCY
+# ===============================================
+
+# Connection settings of each profile, empty values keep the SQLite defaults
+SQLITE_PROFILES = {
+    'default': {
+        'SQLITE_JOURNAL_MODE': '',
+        'SQLITE_SYNCHRONOUS': '',
+        'SQLITE_BUSY_TIMEOUT': '',
+        'SQLITE_CACHE_SIZE': '',
+        'SQLITE_MMAP_SIZE': '',
+        'DB_WRITE_RETRIES': '0'
+    },
+    # Values from the environment, or the dashboard defaults
+    'tuned': {}
+}
+
+def sqlite_benchmark(args):
+    """
+    Compare the SQLite profiles with the production layout: the dashboard
+    readers and the acknowledgment writer in separate processes.
+    """
+    print(f"{args.readers} reader processes, 1 writer process ({args.batch} rows per write), "
+          f"{args.duration}s, {args.rows} seeded rows")
+    print(f"{'profile':<10}{'reads/s':>10}{'read p50':>10}{'read p95':>10}{'read err':>10}"
+          f"{'rows/s':>10}{'write p95':>11}{'write err':>11}")
+    
+    for profile, settings in SQLITE_PROFILES.items():
+        with tempfile.TemporaryDirectory() as directory:
+            env = {
+                **os.environ,
+                **settings,
+                'DATABASE_URL': f"sqlite:///{os.path.join(directory, 'benchmark.db')}",
+                # Every read must reach the database
+                'API_CACHE_TTL': '0'
+            }
+            subprocess.run(worker_command('sqlite-worker', 'seed', args.rows, args.batch),
+                           env=env, cwd=ROOT, check=True)
+            
+            # Workers start together, at a wall clock time shared through argv
+            start_at = time.time() + 2
+            roles = ['writer'] + ['reader'] * args.readers
+            workers = [
+                subprocess.Popen(worker_command('sqlite-worker', role, args.duration, args.batch, start_at),
+                                 env=env, cwd=ROOT, stdout=subprocess.PIPE, text=True)
+                for role in roles
+            ]
+            results = [json.loads(worker.communicate()[0].strip().splitlines()[-1]) for worker in workers]
+        
+        writer, readers = results[0], results[1:]
+        read_times = [elapsed for reader in readers for elapsed in reader['times']]
+        read_errors = sum(reader['errors'] for reader in readers)
+        print(f"{profile:<10}{len(read_times) / args.duration:>10.1f}{ms(percentile(read_times, 50)):>10}"
+              f"{ms(percentile(read_times, 95)):>10}{read_errors:>10}"
+              f"{writer['rows'] / args.duration:>10.1f}{ms(percentile(writer['times'], 95)):>11}"
+              f"{writer['errors']:>11}")
+
+def sqlite_worker(args):
+    """One process of sqlite_benchmark: seeds the database, writes batches or reads the dashboard APIs"""
+    sys.path.insert(0, ROOT)
+    import logging
+    from dashboard import app, init_database, save_acknowledgments
+    
+    app.logger.setLevel(logging.CRITICAL)
+    
+    def make_rows(count, spread):
+        now = datetime.utcnow()
+        return [{
+            'acknowledged_at': now - timedelta(seconds=random.uniform(0, spread)),
+            'service_id': str(random.randint(1, 5000)),
+            'host_id': str(random.randint(1, 500)),
+            'status': random.choice(['WARNING', 'CRITICAL']),
+            'success': random.random() < 0.95,
+            'response_time': random.uniform(0.01, 1.0)
+        } for _ in range(count)]
+    
+    if args.role == 'seed':
+        with app.app_context():
+            init_database()
+            for start in range(0, int(args.value), 5000):
+                save_acknowledgments(make_rows(min(5000, int(args.value) - start), 86400))
+        return
+    
+    today = datetime.utcnow().date()
+    urls = [
+        '/api/dashboard?recent=5',
+        f'/api/history?start_date={today - timedelta(days=7)}&end_date={today}',
+        f'/api/history?start_date={today - timedelta(days=7)}&end_date={today}&status=CRITICAL'
+    ]
+    times = []
+    errors = 0
+    rows = 0
+    
+    time.sleep(max(0, args.start_at - time.time()))
+    deadline = time.monotonic() + args.value
+    with app.app_context():
+        client = app.test_client()
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            if args.role == 'writer':
+                written = save_acknowledgments(make_rows(args.batch, 1))
+                errors += written is None
+                rows += written or 0
+            else:
+                errors += client.get(urls[len(times) % len(urls)]).status_code != 200
+            times.append(time.perf_counter() - started)
+    
+    print(json.dumps({'times': times, 'errors': errors, 'rows': rows}))
+
+# ===============================================
+# END TO END
+# ===============================================
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def e2e_benchmark(args):
+    """Run monitoring.py against the mock Centreon, report throughput, ack latency and DB write rate"""
+    port = free_port()
+    api_url = f"http://127.0.0.1:{port}/centreon/api/latest"
+    mock = subprocess.Popen([
+        sys.executable, os.path.join(ROOT, 'scripts', 'mock_centreon.py'), '--port', str(port),
+        '--alerts', str(args.alerts), '--latency', str(args.latency), '--ack-latency', str(args.ack_latency),
+        '--error-rate', str(args.error_rate), '--reject-rate', str(args.reject_rate), '--capacity', str(args.capacity),
+        '--ack-delay', str(args.ack_delay)
+    ], stdout=subprocess.PIPE, text=True)
+    
+    try:
+        # Ready once the banner is printed
+        print(mock.stdout.readline().strip())
+        with tempfile.TemporaryDirectory() as directory:
+            database = os.path.join(directory, 'benchmark.db')
+            log_file = os.path.join(directory, 'monitoring.log')
+            env = {
+                **os.environ,
+                'CENTREON_API_URL': api_url,
+                'CENTREON_LOGIN': 'benchmark',
+                'CENTREON_PASSWORD': 'benchmark',
+                'DATABASE_URL': f"sqlite:///{database}",
+                'LOG_FILE': log_file,
+                'OUTPUT_FILE': os.path.join(directory, 'alerts_output.json'),
+                'RUN_LOCK_FILE': os.path.join(directory, 'monitoring.lock'),
+                'DB_SPOOL_FILE': os.path.join(directory, 'spool.jsonl'),
+                'TOKEN_CACHE_FILE': '',
+                'DEDUP_CACHE_FILE': os.path.join(directory, 'acknowledged.json')
+            }
+            
+            # Back to back runs share the database and the dedup cache, like cron runs
+            started = time.perf_counter()
+            for _ in range(args.runs):
+                returncode = subprocess.run([sys.executable, os.path.join(ROOT, 'scripts', 'monitoring.py')],
+                                            env=env, cwd=ROOT, stdout=subprocess.DEVNULL,
+                                            stderr=subprocess.DEVNULL).returncode
+                if returncode:
+                    break
+            elapsed = time.perf_counter() - started
+            
+            with open(log_file, encoding='utf-8') as f:
+                log = f.read()
+            with sqlite3.connect(database) as connection:
+                ack_times = [row[0] for row in connection.execute(
+                    'SELECT response_time FROM alert_acknowledgment WHERE response_time IS NOT NULL'
+                )]
+        
+        with urllib.request.urlopen(f"{api_url}/mock/stats") as response:
+            centreon = json.load(response)
+    finally:
+        mock.terminate()
+        mock.wait()
+    
+    # Counters summed over the runs, the log file is appended to
+    summaries = re.findall(r"Summary: (\d+) successful, (\d+) failed, (\d+) skipped", log)
+    writes = re.findall(r"Dashboard writes: (\d+) rows in (\d+) bulk inserts \(([\d.]+)s\), (\d+) spooled", log)
+    pacing = re.findall(r"API pacing: (\{.*\})", log)
+    retries = re.findall(r"Retries: (\d+) requests sent again, (\d+) alerts acknowledged after a retry", log)
+    if returncode or not summaries:
+        print(f"monitoring.py failed (exit code {returncode}), last log lines:")
+        print('\n'.join(log.splitlines()[-10:]))
+        raise SystemExit(1)
+    
+    successful, failed, skipped = (sum(int(summary[i]) for summary in summaries) for i in range(3))
+    print(f"Alerts:       {successful} acknowledged, {failed} failed, {skipped} skipped "
+          f"in {elapsed:.2f}s ({args.runs} run{'s' if args.runs > 1 else ''}) "
+          f"-> {(successful + failed) / elapsed:.1f} alerts/s")
+    print(f"Ack latency:  p50 {ms(percentile(ack_times, 50))} ms, p95 {ms(percentile(ack_times, 95))} ms, "
+          f"p99 {ms(percentile(ack_times, 99))} ms")
+    if writes:
+        rows, flushes, spooled = (sum(int(line[i]) for line in writes) for i in (0, 1, 3))
+        write_time = sum(float(line[2]) for line in writes)
+        rate = f"{rows / write_time:.0f} rows/s" if write_time else '-'
+        print(f"DB writes:    {rows} rows in {flushes} bulk inserts, {write_time:.2f}s -> {rate}, "
+              f"{spooled} spooled")
+    if retries:
+        print(f"Retries:      {sum(int(line[0]) for line in retries)} requests sent again, "
+              f"{sum(int(line[1]) for line in retries)} alerts recovered")
+    if pacing:
+        limiter = ast.literal_eval(pacing[-1])
+        print(f"API pacing:   {limiter['rate']} req/s (peak {limiter['peak_rate']}), "
+              f"{limiter['concurrency']} concurrent, {limiter['slowdowns']} slowdowns, "
+              f"{limiter['wait_time']}s waiting")
+    print(f"Centreon:     {centreon['login']} login, {centreon['resources']} resources, "
+          f"{centreon['acknowledge']} acknowledge requests, {centreon['errors']} errors, "
+          f"{centreon['duplicates']} duplicate acks, {centreon['overloaded']} overloaded, "
+          f"peak {centreon['peak_in_flight']} concurrent")
+
+# ===============================================
+# STARTUP
+# ===============================================
+
+# Statements timed with -X importtime, the script also imports the recorder when main() starts
+STARTUP_TARGETS = {
+    'monitoring': 'import monitoring; monitoring.load_recorder()',
+    'dashboard': 'import dashboard'
+}
+
+def import_times(statement):
+    """Run a statement under python -X importtime, returns ({module: cumulative seconds}, top-level modules)"""
+    env = {
+        **os.environ,
+        # monitoring.py exits at import without Centreon settings
+        'CENTREON_API_URL': os.getenv('CENTREON_API_URL', 'http://127.0.0.1:1/centreon/api/latest'),
+        'CENTREON_LOGIN': os.getenv('CENTREON_LOGIN', 'benchmark'),
+        'CENTREON_PASSWORD': os.getenv('CENTREON_PASSWORD', 'benchmark')
+    }
+    setup = f"import sys; sys.path[:0] = [{ROOT!r}, {os.path.join(ROOT, 'scripts')!r}]; "
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', setup + statement], env=env, cwd=ROOT,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True).stderr
+    
+    cumulative, top_level = {}, []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, microseconds, name = line.split('|')
+        module = name.strip()
+        cumulative[module] = int(microseconds) / 1e6
+        # Nested imports are indented by two more spaces per level
+        if not name.startswith('  '):
+            top_level.append(module)
+    return cumulative, top_level
+
+def startup_benchmark(args):
+    """Import cost of the acknowledgment script and of the dashboard, fails over budget or if Flask is loaded"""
+    failed = False
+    for target, statement in STARTUP_TARGETS.items():
+        runs = [import_times(statement) for _ in range(args.runs)]
+        totals = sorted(sum(cumulative[module] for module in top_level) for cumulative, top_level in runs)
+        cumulative, top_level = runs[-1]
+        slowest = sorted(top_level, key=cumulative.get, reverse=True)[:args.top]
+        
+        print(f"{target}: {ms(totals[len(totals) // 2])} ms of imports (median of {args.runs}), "
+              f"{len(cumulative)} modules, flask {'loaded' if 'flask' in cumulative else 'not loaded'}")
+        for module in slowest:
+            print(f"    {ms(cumulative[module]):>8} ms  {module}")
+        
+        if target == 'monitoring':
+            over_budget = args.budget_ms and totals[len(totals) // 2] * 1000 > args.budget_ms
+            if 'flask' in cumulative or over_budget:
+                print(f"FAIL monitoring startup: budget {args.budget_ms} ms, Flask must not be imported")
+                failed = True
+    
+    if failed:
+        raise SystemExit(1)
+
+# ===============================================
+# RULES
+# ===============================================
+
+def generate_rules(count, hosts, services, pattern_share, rng):
+    """Rules file of exact host rules, exact service rules and a pattern_share of glob and regex rules"""
+    rules = []
+    for index in range(count):
+        rule = {'name': f'rule-{index}', 'action': 'skip' if rng.random() < 0.2 else 'ack'}
+        draw = rng.random()
+        if draw < pattern_share:
+            prefix = rng.randrange(100)
+            # Suffix globs have no literal prefix, they end up in the combined regex
+            rule['host'] = (f'host-{prefix}*', f're:host-{prefix}[0-9]+', f'*{prefix}')[index % 3]
+            rule['service'] = f'*-{rng.randrange(services)}' if index % 3 == 2 else f'service-{rng.randrange(services)}*'
+        elif draw < (1 + pattern_share) / 2:
+            rule['host'] = f'host-{rng.randrange(hosts)}'
+            if rng.random() < 0.5:
+                rule['service'] = f'service-{rng.randrange(services)}*'
+        else:
+            rule['service'] = f'service-{rng.randrange(services)}'
+            if rng.random() < 0.5:
+                rule['hostgroup'] = f'hostgroup-{rng.randrange(20)}'
+        if rng.random() < 0.3:
+            rule['status'] = rng.choice(['WARNING', 'CRITICAL'])
+        rules.append(rule)
+    return {'comment': 'Auto ACK ({rule}): {service_name} on {host_name}', 'rules': rules}
+
+def rules_benchmark(args):
+    """Time rule matching per alert with the compiled index, against a linear scan of the same rules"""
+    sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+    import ack_rules
+    
+    rng = random.Random(42)
+    data = generate_rules(args.rules, args.hosts, args.services, args.pattern_share, rng)
+    alerts = [{
+        'host_name': f'host-{rng.randrange(args.hosts)}',
+        'service_name': f'service-{rng.randrange(args.services)}',
+        'status': rng.choice(['WARNING', 'CRITICAL']),
+        'hostgroups': [f'hostgroup-{rng.randrange(20)}', f'hostgroup-{rng.randrange(20)}']
+    } for _ in range(args.alerts)]
+    
+    started = time.perf_counter()
+    rule_set = ack_rules.compile_rules(data, 'Auto ACK')
+    compile_time = time.perf_counter() - started
+    
+    indexed_times, matched = [], []
+    for alert in alerts:
+        started = time.perf_counter()
+        rule = rule_set.match(alert)
+        indexed_times.append(time.perf_counter() - started)
+        matched.append(rule)
+    
+    linear_times, mismatches = [], 0
+    for alert, expected in zip(alerts[:args.linear_alerts], matched):
+        started = time.perf_counter()
+        key = ack_rules.match_key(alert)
+        rule = next((rule for rule in rule_set.rules if rule.matches(key, alert)), None)
+        linear_times.append(time.perf_counter() - started)
+        mismatches += rule is not expected
+    
+    def us(seconds):
+        return f"{seconds * 1e6:.1f}"
+    
+    p99 = percentile(indexed_times, 99)
+    print(f"Rules:        {len(rule_set)} ({rule_set.stats()['indexed']} indexed by name or prefix, "
+          f"{len(rule_set.pattern_rules)} in the combined regex), compiled in {ms(compile_time)} ms")
+    print(f"Indexed:      p50 {us(percentile(indexed_times, 50))} us, p99 {us(p99)} us per alert, "
+          f"{len(alerts) / sum(indexed_times):.0f} alerts/s, "
+          f"{sum(rule is not None for rule in matched)}/{len(alerts)} alerts matched")
+    print(f"Linear scan:  p50 {us(percentile(linear_times, 50))} us, p99 {us(percentile(linear_times, 99))} us "
+          f"per alert ({len(linear_times)} alerts)")
+    print(f"Same rule as the linear scan for {len(linear_times) - mismatches}/{len(linear_times)} alerts")
+    
+    if mismatches or (args.budget_us and p99 * 1e6 > args.budget_us):
+        print(f"FAIL rules: {mismatches} mismatches, p99 budget {args.budget_us} us")
+        raise SystemExit(1)
+
+# ===============================================
+# MAIN
+# ===============================================
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmarks for the acknowledgment script and the dashboard")
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    sqlite = commands.add_parser('sqlite', help='concurrent dashboard reads during bulk writes, per SQLite profile')
+    sqlite.add_argument('--readers', type=int, default=8, help='concurrent reader processes (default: 8)')
+    sqlite.add_argument('--duration', type=float, default=10, help='seconds per profile (default: 10)')
+    sqlite.add_argument('--rows', type=int, default=50000, help='rows seeded before the run (default: 50000)')
+    sqlite.add_argument('--batch', type=int, default=100, help='rows per write transaction (default: 100)')
+    sqlite.set_defaults(handler=sqlite_benchmark)
+    
+    e2e = commands.add_parser('e2e', help='monitoring.py against the mock Centreon, ACK_* settings from the environment')
+    e2e.add_argument('--alerts', type=int, default=1000, help='unhandled alerts (default: 1000)')
+    e2e.add_argument('--latency', type=float, default=0.05, help='seconds per login and resources request (default: 0.05)')
+    e2e.add_argument('--ack-latency', type=float, default=0.02, help='seconds per acknowledge request (default: 0.02)')
+    e2e.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered 503 (default: 0)')
+    e2e.add_argument('--capacity', type=int, default=0,
+                     help='concurrent requests the mock serves before answering 503, 0 unlimited (default: 0)')
+    e2e.add_argument('--ack-delay', type=float, default=0,
+                     help='seconds an acknowledged alert stays listed as unhandled by the mock (default: 0)')
+    e2e.add_argument('--runs', type=int, default=1,
+                     help='monitoring.py runs back to back against the same mock (default: 1)')
+    e2e.add_argument('--reject-rate', type=float, default=0.0, help='fraction of alerts refused (default: 0)')
+    e2e.set_defaults(handler=e2e_benchmark)
+    
+    startup = commands.add_parser('startup', help='python -X importtime of the script and of the dashboard')
+    startup.add_argument('--runs', type=int, default=5, help='runs per target, the median is reported (default: 5)')
+    startup.add_argument('--top', type=int, default=8, help='slowest top-level imports shown (default: 8)')
+    startup.add_argument('--budget-ms', type=float, default=0,
+                         help='fail if the script imports take longer, 0 disables (default: 0)')
+    startup.set_defaults(handler=startup_benchmark)
+    
+    rules = commands.add_parser('rules', help='acknowledgment rule matching, compiled index against a linear scan')
+    rules.add_argument('--rules', type=int, default=5000, help='generated rules (default: 5000)')
+    rules.add_argument('--alerts', type=int, default=20000, help='alerts matched (default: 20000)')
+    rules.add_argument('--hosts', type=int, default=2000, help='distinct host names (default: 2000)')
+    rules.add_argument('--services', type=int, default=200, help='distinct service names (default: 200)')
+    rules.add_argument('--pattern-share', type=float, default=0.05,
+                       help='fraction of rules using globs or regexes on both names (default: 0.05)')
+    rules.add_argument('--linear-alerts', type=int, default=1000,
+                       help='alerts also matched by a linear scan, to compare and check (default: 1000)')
+    rules.add_argument('--budget-us', type=float, default=0,
+                       help='fail if the p99 match time per alert is higher, 0 disables (default: 0)')
+    rules.set_defaults(handler=rules_benchmark)
+    
+    worker = commands.add_parser('sqlite-worker')
+    worker.add_argument('role', choices=['seed', 'reader', 'writer'])
+    worker.add_argument('value', type=float, help='rows to seed, or seconds to run')
+    worker.add_argument('batch', type=int)
+    worker.add_argument('start_at', type=float, nargs='?', default=0)
+    worker.set_defaults(handler=sqlite_worker)
+    
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    args.handler(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Mock Centreon API for local tests and benchmarks
+Serves /login, /monitoring/resources and /monitoring/resources/acknowledge
+under any API prefix, with configurable alert volume, latency and errors
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+# ===============================================
+# STATE
+# ===============================================
+
+class MockCentreon:
+    """Unhandled alerts, tokens and request counters shared by the handler threads"""
+    
+    def __init__(self, alerts, hosts, reject_rate, token_ttl, seed, ack_delay=0):
+        rng = random.Random(seed)
+        self.alerts = {
+            service_id: {
+                "service_id": service_id,
+                "host_id": 1000 + service_id % hosts,
+                "name": f"service-{service_id}",
+                "parent": {
+                    "id": 1000 + service_id % hosts,
+                    "name": f"host-{service_id % hosts}",
+                    "groups": [{"id": service_id % hosts % 5, "name": f"hostgroup-{service_id % hosts % 5}"}]
+                },
+                "status": {"name": rng.choice(["WARNING", "CRITICAL"])}
+            }
+            for service_id in range(1, alerts + 1)
+        }
+        # Alerts Centreon refuses to acknowledge, every time
+        self.rejected = {service_id for service_id in self.alerts if rng.random() < reject_rate}
+        self.token_ttl = token_ttl
+        # Centreon applies acknowledgments asynchronously, they stay listed as unhandled meanwhile
+        self.ack_delay = ack_delay
+        self.tokens = {}
+        self.acknowledged = {}
+        self.counters = {"login": 0, "resources": 0, "acknowledge": 0, "unauthorized": 0,
+                         "errors": 0, "overloaded": 0, "rejected": 0, "duplicates": 0}
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.lock = threading.Lock()
+    
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+    
+    def enter(self, capacity):
+        """Count a request in flight, False when capacity is already reached"""
+        with self.lock:
+            if capacity and self.in_flight >= capacity:
+                self.counters["overloaded"] += 1
+                return False
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            return True
+    
+    def leave(self):
+        with self.lock:
+            self.in_flight -= 1
+    
+    def login(self):
+        token = uuid.uuid4().hex
+        with self.lock:
+            self.tokens[token] = time.monotonic() + self.token_ttl if self.token_ttl else None
+        return token
+    
+    def authorized(self, token):
+        with self.lock:
+            if token not in self.tokens:
+                return False
+            expires_at = self.tokens[token]
+            return expires_at is None or expires_at > time.monotonic()
+    
+    def unhandled(self, page, limit):
+        """One page of the alerts not acknowledged yet, and their total"""
+        visible_before = time.monotonic() - self.ack_delay
+        with self.lock:
+            pending = [alert for service_id, alert in self.alerts.items()
+                       if self.acknowledged.get(service_id, visible_before) >= visible_before]
+        return pending[(page - 1) * limit:page * limit], len(pending)
+    
+    def acknowledge(self, service_ids):
+        """Acknowledge every service or none, False when one of them is rejected"""
+        with self.lock:
+            if any(service_id in self.rejected for service_id in service_ids):
+                self.counters["rejected"] += 1
+                return False
+            now = time.monotonic()
+            for service_id in service_ids:
+                if service_id in self.acknowledged:
+                    self.counters["duplicates"] += 1
+                else:
+                    self.acknowledged[service_id] = now
+            return True
+    
+    def stats(self):
+        with self.lock:
+            return dict(self.counters, alerts=len(self.alerts), acknowledged=len(self.acknowledged),
+                        rejected_alerts=len(self.rejected), peak_in_flight=self.peak_in_flight)
+
+# ===============================================
+# HTTP HANDLER
+# ===============================================
+
+class MockHandler(BaseHTTPRequestHandler):
+    # Keep-alive, like Centreon behind Apache
+    protocol_version = "HTTP/1.1"
+    
+    # Set by serve()
+    state = None
+    options = None
+    
+    def log_message(self, format, *args):
+        if self.options.verbose:
+            super().log_message(format, *args)
+    
+    def send_json(self, code, payload=None):
+        body = json.dumps(payload).encode() if payload is not None else b""
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length)) if length else {}
+    
+    def wait(self, latency):
+        """Simulated server time, latency +/- jitter, slower as requests pile up"""
+        jitter = latency * self.options.latency_jitter
+        if self.options.capacity:
+            latency *= 1 + self.state.in_flight / self.options.capacity
+        time.sleep(max(0.0, random.uniform(latency - jitter, latency + jitter)))
+    
+    def overloaded(self):
+        """More concurrent requests than --capacity, answered with 503 at once"""
+        if self.state.enter(self.options.capacity):
+            return False
+        self.send_json(503, {"code": 503, "message": "Service Unavailable"})
+        return True
+    
+    def failed(self):
+        """Random transient error, answered with 503 like an overloaded Centreon"""
+        if random.random() < self.options.error_rate:
+            self.state.count("errors")
+            self.send_json(503, {"code": 503, "message": "Service Unavailable"})
+            return True
+        return False
+    
+    def authenticated(self):
+        if self.state.authorized(self.headers.get("X-AUTH-TOKEN")):
+            return True
+        self.state.count("unauthorized")
+        self.send_json(401, {"code": 401, "message": "Unauthorized"})
+        return False
+    
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path.endswith("/mock/stats"):
+            return self.send_json(200, self.state.stats())
+        if not url.path.endswith("/monitoring/resources"):
+            return self.send_json(404, {"code": 404, "message": "Not found"})
+        
+        if not self.authenticated():
+            return
+        self.state.count("resources")
+        if self.overloaded():
+            return
+        try:
+            self.wait(self.options.latency)
+        finally:
+            self.state.leave()
+        if self.failed():
+            return
+        
+        query = parse_qs(url.query)
+        page = int(query.get("page", ["1"])[0])
+        limit = int(query.get("limit", ["10"])[0])
+        alerts, total = self.state.unhandled(page, limit)
+        self.send_json(200, {"result": alerts, "meta": {"page": page, "limit": limit, "search": {}, "total": total}})
+    
+    def do_POST(self):
+        path = urlparse(self.path).path
+        payload = self.read_json()
+        
+        if path.endswith("/login"):
+            self.state.count("login")
+            self.wait(self.options.latency)
+            return self.send_json(200, {"contact": {"alias": "mock"}, "security": {"token": self.state.login()}})
+        if not path.endswith("/monitoring/resources/acknowledge"):
+            return self.send_json(404, {"code": 404, "message": "Not found"})
+        
+        if not self.authenticated():
+            return
+        self.state.count("acknowledge")
+        resources = payload.get("resources", [])
+        if self.overloaded():
+            return
+        # Bulk requests cost a base latency plus a share per resource
+        try:
+            self.wait(self.options.ack_latency + self.options.ack_latency_per_resource * len(resources))
+        finally:
+            self.state.leave()
+        if self.failed():
+            return
+        
+        if self.state.acknowledge([resource["id"] for resource in resources]):
+            self.send_json(204)
+        else:
+            self.send_json(400, {"code": 400, "message": "Resource cannot be acknowledged"})
+
+# ===============================================
+# MAIN
+# ===============================================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Mock Centreon API")
+    parser.add_argument("--host", default="127.0.0.1", help="listen address (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="listen port (default: 8765)")
+    parser.add_argument("--alerts", type=int, default=1000, help="unhandled alerts served (default: 1000)")
+    parser.add_argument("--hosts", type=int, default=50, help="hosts the alerts are spread over (default: 50)")
+    parser.add_argument("--latency", type=float, default=0.05,
+                        help="seconds per login and resources request (default: 0.05)")
+    parser.add_argument("--ack-latency", type=float, default=0.02,
+                        help="seconds per acknowledge request (default: 0.02)")
+    parser.add_argument("--ack-latency-per-resource", type=float, default=0.001,
+                        help="extra seconds per resource of an acknowledge request (default: 0.001)")
+    parser.add_argument("--latency-jitter", type=float, default=0.2,
+                        help="random +/- fraction of every latency (default: 0.2)")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="fraction of requests answered 503 (default: 0)")
+    parser.add_argument("--capacity", type=int, default=0,
+                        help="concurrent requests served, more are answered 503 and latency grows "
+                             "with the load, 0 unlimited (default: 0)")
+    parser.add_argument("--reject-rate", type=float, default=0.0,
+                        help="fraction of alerts always refused with 400 (default: 0)")
+    parser.add_argument("--ack-delay", type=float, default=0,
+                        help="seconds an acknowledged alert is still listed as unhandled (default: 0)")
+    parser.add_argument("--token-ttl", type=float, default=0,
+                        help="seconds before a token expires, 0 never (default: 0)")
+    parser.add_argument("--seed", type=int, default=42, help="random seed of the alert set (default: 42)")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    return parser.parse_args(argv)
+
+def serve(options):
+    MockHandler.state = MockCentreon(options.alerts, options.hosts, options.reject_rate,
+                                     options.token_ttl, options.seed, options.ack_delay)
+    MockHandler.options = options
+    server = ThreadingHTTPServer((options.host, options.port), MockHandler)
+    server.daemon_threads = True
+    print(f"Mock Centreon on http://{options.host}:{server.server_port}/centreon/api/latest "
+          f"({options.alerts} alerts)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    serve(parse_args())
@@ -4,15 +4,38 @@ Centreon alert auto-acknowledgment script
 English version with dashboard integration
 """
 
+import argparse
+import atexit
+import heapq
+import itertools
+import random
+import signal
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
 import json
 import urllib3
 import os
 import sys
 import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from collections import deque
+from contextlib import contextmanager
 from datetime import datetime
 from dotenv import load_dotenv
 
+from ack_rules import RulesError, load_rules
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
 # Disable SSL warnings
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
@@ -22,16 +45,9 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 load_dotenv()
 
-# Dashboard integration
-try:
-    # Add parent directory to path for dashboard import
-    sys.path.append(os.path.dirname(os.path.dirname(__file__)))
-    from dashboard import app, db, save_acknowledgment
-    DASHBOARD_ENABLED = True
-    print("Dashboard detected - Integration enabled")
-except ImportError:
-    DASHBOARD_ENABLED = False
-    print("Dashboard not detected - Standalone mode")
+# Dashboard integration, set by load_recorder() when main() starts
+DASHBOARD_ENABLED = None
+recorder = None
 
 # Centreon API
 API_URL = os.getenv("CENTREON_API_URL")
@@ -56,10 +72,62 @@ LOGIN_TIMEOUT = int(os.getenv("LOGIN_TIMEOUT", 30))
 API_TIMEOUT = int(os.getenv("API_TIMEOUT", 60))
 ACK_TIMEOUT = int(os.getenv("ACK_TIMEOUT", 20))
 
+# Acknowledgment comment, and rules selecting the alerts to acknowledge (empty ACK_RULES_FILE acknowledges all)
+ACK_COMMENT = os.getenv("ACK_COMMENT", "Auto ACK by Miguel")
+
+# Acknowledgment batching (1 = one request per alert)
+ACK_BATCH_SIZE = max(1, int(os.getenv("ACK_BATCH_SIZE", 1)))
+
+# Acknowledgment concurrency (worker threads, pending batches cap)
+ACK_CONCURRENCY = max(1, int(os.getenv("ACK_CONCURRENCY", 1)))
+ACK_MAX_IN_FLIGHT = max(ACK_CONCURRENCY, int(os.getenv("ACK_MAX_IN_FLIGHT", ACK_CONCURRENCY * 2)))
+
+# HTTP session (connection pool size, retries of reads on 502/503/504)
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", max(10, ACK_CONCURRENCY + 1)))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", 3))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", 0.5))
+
+# Acknowledgment retries on timeouts, connection errors and 502/503/504 (jittered exponential backoff, seconds)
+ACK_RETRIES = max(0, int(os.getenv("ACK_RETRIES", 3)))
+ACK_RETRY_BACKOFF = float(os.getenv("ACK_RETRY_BACKOFF", 1.0))
+ACK_RETRY_MAX_DELAY = float(os.getenv("ACK_RETRY_MAX_DELAY", 30))
+
+# Circuit breaker (consecutive failures before pausing requests, 0 disables; pause in seconds)
+BREAKER_THRESHOLD = int(os.getenv("BREAKER_THRESHOLD", 5))
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", 30))
+
+# Adaptive pacing of Centreon requests (requests per second, AIMD on latency and errors)
+API_ADAPTIVE_LIMIT = os.getenv("API_ADAPTIVE_LIMIT", "True").lower() == "true"
+API_RATE = float(os.getenv("API_RATE", 10))
+API_MIN_RATE = float(os.getenv("API_MIN_RATE", 1))
+API_MAX_RATE = float(os.getenv("API_MAX_RATE", 500))
+API_RATE_STEP = float(os.getenv("API_RATE_STEP", 10))
+API_LATENCY_FACTOR = float(os.getenv("API_LATENCY_FACTOR", 3.0))
+API_ERROR_THRESHOLD = float(os.getenv("API_ERROR_THRESHOLD", 0.2))
+
+# Token cache (empty TOKEN_CACHE_FILE disables it)
+TOKEN_TTL = int(os.getenv("TOKEN_TTL", 3600))
+
+# Seconds an acknowledged (host, service) is skipped by later runs (empty DEDUP_CACHE_FILE disables it)
+DEDUP_TTL = int(os.getenv("DEDUP_TTL", 600))
+
+# Dashboard writes (rows per bulk insert, max seconds a row waits in queue)
+DB_FLUSH_SIZE = max(1, int(os.getenv("DB_FLUSH_SIZE", 100)))
+DB_FLUSH_INTERVAL = float(os.getenv("DB_FLUSH_INTERVAL", 1.0))
+
+# Daemon mode polling (seconds)
+POLL_INTERVAL = float(os.getenv("POLL_INTERVAL", 60))
+POLL_JITTER = float(os.getenv("POLL_JITTER", 5))
+
 # File paths
 today = datetime.now().strftime("%Y-%m-%d")
 OUTPUT_FILE = os.getenv("OUTPUT_FILE", os.path.join(OUTPUT_DIR, "alerts_output.json"))
 LOG_FILE = os.getenv("LOG_FILE", os.path.join(LOG_DIR, f"{today}_centreon.log"))
+TOKEN_CACHE_FILE = os.getenv("TOKEN_CACHE_FILE", os.path.join(OUTPUT_DIR, ".centreon_token.json"))
+DEDUP_CACHE_FILE = os.getenv("DEDUP_CACHE_FILE", os.path.join(OUTPUT_DIR, ".acknowledged.json"))
+ACK_RULES_FILE = os.getenv("ACK_RULES_FILE", "")
+RUN_LOCK_FILE = os.getenv("RUN_LOCK_FILE", os.path.join(OUTPUT_DIR, ".monitoring.lock"))
+DB_SPOOL_FILE = os.getenv("DB_SPOOL_FILE", os.path.join(OUTPUT_DIR, "dashboard_spool.jsonl"))
 
 # Ensure absolute paths
 if not os.path.isabs(OUTPUT_FILE):
@@ -68,10 +136,686 @@ if not os.path.isabs(OUTPUT_FILE):
 if not os.path.isabs(LOG_FILE):
     LOG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", LOG_FILE)
 
+if TOKEN_CACHE_FILE and not os.path.isabs(TOKEN_CACHE_FILE):
+    TOKEN_CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", TOKEN_CACHE_FILE)
+
+if DEDUP_CACHE_FILE and not os.path.isabs(DEDUP_CACHE_FILE):
+    DEDUP_CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", DEDUP_CACHE_FILE)
+
+if ACK_RULES_FILE and not os.path.isabs(ACK_RULES_FILE):
+    ACK_RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ACK_RULES_FILE)
+
+if RUN_LOCK_FILE and not os.path.isabs(RUN_LOCK_FILE):
+    RUN_LOCK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", RUN_LOCK_FILE)
+
+if not os.path.isabs(DB_SPOOL_FILE):
+    DB_SPOOL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", DB_SPOOL_FILE)
+
+# ===============================================
+# CENTREON CLIENT
+# ===============================================
+
+# Responses of an overloaded or restarting Centreon, worth sending the same request again
+RETRY_STATUSES = frozenset([502, 503, 504])
+
+# Responses rejecting some resources of a request, isolated by splitting the batch
+REJECT_STATUSES = frozenset([400, 409, 422])
+
+# Per-thread timing of the last request sent through a CentreonClient
+_request_timing = threading.local()
+
+class TimedHTTPConnection(HTTPConnection):
+    """HTTP connection recording how long TCP setup takes"""
+    
+    def connect(self):
+        started = time.monotonic()
+        super().connect()
+        _request_timing.connect_time = getattr(_request_timing, "connect_time", 0.0) + time.monotonic() - started
+
+class TimedHTTPSConnection(HTTPSConnection):
+    """HTTPS connection recording how long TCP and TLS setup take"""
+    
+    def connect(self):
+        started = time.monotonic()
+        super().connect()
+        _request_timing.connect_time = getattr(_request_timing, "connect_time", 0.0) + time.monotonic() - started
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools open timed connections"""
+    
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool
+        }
+
+class TokenCache:
+    """Centreon token persisted in a file readable by its owner only"""
+    
+    def __init__(self, path, api_url, login, ttl=TOKEN_TTL):
+        self.path = path
+        self.key = f"{login}@{api_url}"
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+    
+    def _read(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def _write(self, data):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, self.path)
+    
+    def load(self):
+        """Return the cached token if still valid, counting hit or miss"""
+        data = self._read()
+        token = None
+        if data.get("key") == self.key and data.get("expires_at", 0) > time.time():
+            token = data.get("token")
+        
+        if token:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return token
+    
+    def store(self, token):
+        data = self._read()
+        data.update({
+            "key": self.key,
+            "token": token,
+            "expires_at": time.time() + self.ttl if token else 0
+        })
+        self._write(data)
+    
+    def invalidate(self):
+        self.store(None)
+    
+    def save_stats(self):
+        """Add this run's counters to the persisted totals, returns the totals"""
+        data = self._read()
+        data["hits"] = data.get("hits", 0) + self.hits
+        data["misses"] = data.get("misses", 0) + self.misses
+        self._write(data)
+        self.hits = 0
+        self.misses = 0
+        return data["hits"], data["misses"]
+
+class DedupCache:
+    """
+    Resources acknowledged recently, skipped before any request.
+    
+    Acknowledged (host_id, service_id) keys are kept ttl seconds, in
+    memory between daemon runs and in a file between processes. Keys
+    being acknowledged are claimed too, so a service listed twice in the
+    same run (pages shifting while they are fetched) is sent once. Failed
+    acknowledgments are released to be tried again. Only used from the
+    thread running acknowledge_alerts().
+    """
+    
+    def __init__(self, path, ttl=DEDUP_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.acknowledged = {}
+        self.in_flight = set()
+    
+    @staticmethod
+    def key(service):
+        return f"{service['host_id']}:{service['service_id']}"
+    
+    def _read(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def load(self):
+        """Merge the keys saved by previous runs, dropping expired ones"""
+        now = time.time()
+        for key, expires_at in self._read().items():
+            if expires_at > now and expires_at > self.acknowledged.get(key, 0):
+                self.acknowledged[key] = expires_at
+        self.acknowledged = {key: expires_at for key, expires_at in self.acknowledged.items() if expires_at > now}
+    
+    def save(self):
+        """Write unexpired keys, including those saved meanwhile by another process"""
+        self.load()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.acknowledged, f)
+        os.replace(tmp_path, self.path)
+    
+    def claim(self, service):
+        """False if the service was acknowledged within ttl or is being acknowledged, else claim it"""
+        key = self.key(service)
+        if key in self.in_flight or self.acknowledged.get(key, 0) > time.time():
+            return False
+        self.in_flight.add(key)
+        return True
+    
+    def release(self, service, success):
+        key = self.key(service)
+        self.in_flight.discard(key)
+        if success:
+            self.acknowledged[key] = time.time() + self.ttl
+
+class AdaptiveLimiter:
+    """
+    Pacing of the requests sent to Centreon: a token bucket refilled at
+    rate requests per second, and a cap on concurrent requests.
+    
+    Both adapt with AIMD: until the first slowdown every success adds
+    rate_step req/s and one concurrent request (slow start), then they grow
+    additively (about rate_step req/s per second and one concurrent request
+    per round trip) and are halved, at most once per round trip, when the
+    error rate of the last WINDOW responses passes its threshold, or when
+    the average latency of a request type (page fetches, acknowledgments)
+    passes latency_factor times its fastest recent response: a slow but
+    steady Centreon is not mistaken for an overloaded one.
+    """
+    
+    WINDOW = 20
+    LOG_INTERVAL = 10
+    # Latency below the fastest response plus this margin (seconds) never counts as pressure
+    LATENCY_MARGIN = 0.05
+    # Lifetime of the fastest response of a request type (seconds), so it follows a lasting change
+    BASE_LATENCY_TTL = 60
+    
+    def __init__(self, rate=API_RATE, min_rate=API_MIN_RATE, max_rate=API_MAX_RATE, rate_step=API_RATE_STEP,
+                 max_concurrency=HTTP_POOL_SIZE, latency_factor=API_LATENCY_FACTOR,
+                 error_threshold=API_ERROR_THRESHOLD):
+        self.rate = float(rate)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.rate_step = rate_step
+        self.concurrency = 1.0
+        self.max_concurrency = max_concurrency
+        self.latency_factor = latency_factor
+        self.error_threshold = error_threshold
+        
+        self.tokens = 1.0
+        self.refilled_at = time.monotonic()
+        self.in_flight = 0
+        self.outcomes = deque(maxlen=self.WINDOW)
+        self.latency = None
+        # Per request type: [average latency, fastest recent latency, time it was seen]
+        self.latencies = {}
+        self.condition = threading.Condition()
+        
+        self.requests = 0
+        self.decreases = 0
+        self.wait_time = 0.0
+        self.peak_rate = self.rate
+        self.last_decrease = 0.0
+        self.last_log = time.monotonic()
+    
+    def acquire(self):
+        """Block until a request may be sent"""
+        started = time.monotonic()
+        with self.condition:
+            while True:
+                if self.in_flight >= int(self.concurrency):
+                    self.condition.wait()
+                    continue
+                now = time.monotonic()
+                # Bursts stay within the concurrency cap
+                self.tokens = min(max(1.0, self.concurrency), self.tokens + (now - self.refilled_at) * self.rate)
+                self.refilled_at = now
+                if self.tokens >= 1:
+                    break
+                self.condition.wait((1 - self.tokens) / self.rate)
+            self.tokens -= 1
+            self.in_flight += 1
+            self.wait_time += time.monotonic() - started
+    
+    def release(self, latency, failed, kind=None):
+        """
+        Record the outcome of a request: failed is a 5xx, 429, timeout or
+        connection error, kind the request type its latency is compared within.
+        """
+        with self.condition:
+            self.in_flight -= 1
+            self.requests += 1
+            self.outcomes.append(failed)
+            self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+            error_rate = sum(self.outcomes) / len(self.outcomes)
+            now = time.monotonic()
+            slow = False
+            if not failed:
+                average, base, seen_at = self.latencies.get(kind) or (latency, latency, now)
+                average = 0.8 * average + 0.2 * latency
+                if latency <= base or now - seen_at > self.BASE_LATENCY_TTL:
+                    base, seen_at = latency, now
+                self.latencies[kind] = (average, base, seen_at)
+                slow = average > max(base * self.latency_factor, base + self.LATENCY_MARGIN)
+            
+            if error_rate > self.error_threshold or slow:
+                if now - self.last_decrease >= self.latency:
+                    self.rate = max(self.min_rate, self.rate / 2)
+                    self.concurrency = max(1.0, self.concurrency / 2)
+                    self.last_decrease = now
+                    self.decreases += 1
+                    self.outcomes.clear()
+                    logging.warning(f"Centreon under pressure (errors {error_rate:.0%}, latency {self.latency:.2f}s), "
+                                    f"slowing down to {self.describe()}")
+            elif not failed:
+                if self.decreases:
+                    self.rate = min(self.max_rate, self.rate + self.rate_step / self.rate)
+                    self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+                else:
+                    self.rate = min(self.max_rate, self.rate + self.rate_step)
+                    self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+                self.peak_rate = max(self.peak_rate, self.rate)
+            
+            if now - self.last_log >= self.LOG_INTERVAL:
+                self.last_log = now
+                logging.info(f"API pacing: {self.describe()}")
+            self.condition.notify_all()
+    
+    def describe(self):
+        return f"{self.rate:.1f} req/s, {int(self.concurrency)} concurrent"
+    
+    def stats(self):
+        with self.condition:
+            return {
+                "rate": round(self.rate, 1),
+                "peak_rate": round(self.peak_rate, 1),
+                "concurrency": int(self.concurrency),
+                "requests": self.requests,
+                "slowdowns": self.decreases,
+                "wait_time": round(self.wait_time, 2)
+            }
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Request not sent, the circuit breaker is open"""
+
+class CircuitBreaker:
+    """
+    Stops sending requests to a Centreon that keeps failing.
+    
+    After threshold consecutive failures (timeouts, connection errors,
+    502/503/504) the circuit opens: requests fail at once with
+    CircuitOpenError for cooldown seconds. Then one trial request is let
+    through; its success closes the circuit, its failure opens it again.
+    """
+    
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+        self.lock = threading.Lock()
+        
+        self.opened = 0
+        self.rejected = 0
+    
+    def allow(self):
+        """True if a request may be sent now"""
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if not self.trial and time.monotonic() - self.opened_at >= self.cooldown:
+                self.trial = True
+                logging.info("Circuit breaker half-open, sending a trial request")
+                return True
+            self.rejected += 1
+            return False
+    
+    def record(self, failed):
+        with self.lock:
+            if not failed:
+                if self.opened_at is not None:
+                    logging.info("Centreon answering again, circuit breaker closed")
+                self.failures = 0
+                self.opened_at = None
+                self.trial = False
+                return
+            
+            self.failures += 1
+            if self.trial or (self.opened_at is None and self.failures >= self.threshold):
+                self.opened_at = time.monotonic()
+                self.trial = False
+                self.opened += 1
+                logging.warning(f"Circuit breaker open after {self.failures} consecutive failures, "
+                                f"pausing Centreon requests for {self.cooldown:.0f}s")
+    
+    def retry_after(self):
+        """Seconds before requests may be sent again, 0 when the circuit is closed"""
+        with self.lock:
+            if self.opened_at is None:
+                return 0.0
+            return max(0.0, self.opened_at + self.cooldown - time.monotonic())
+    
+    def stats(self):
+        with self.lock:
+            return {
+                "state": "closed" if self.opened_at is None else "open",
+                "opened": self.opened,
+                "rejected": self.rejected
+            }
+
+class CentreonClient:
+    """Centreon API client sharing one pooled keep-alive HTTP session"""
+    
+    def __init__(self, api_url, pool_size=HTTP_POOL_SIZE, retries=HTTP_RETRIES,
+                 token_cache=None, relogin=None, limiter=None, breaker=None):
+        self.api_url = api_url.rstrip("/")
+        self.token = None
+        self.token_cache = token_cache
+        self.relogin = relogin
+        self.limiter = limiter
+        self.breaker = breaker
+        self._auth_lock = threading.Lock()
+        
+        # 5xx retried here only for reads. Connection errors are retried by the
+        # callers through the limiter and circuit breaker, not stacked on top of them
+        retry = Retry(
+            total=retries,
+            connect=0,
+            read=0,
+            status=retries,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(["GET"]),
+            backoff_factor=HTTP_BACKOFF,
+            raise_on_status=False
+        )
+        self.adapter = TimedHTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=pool_size,
+            pool_block=True,
+            max_retries=retry
+        )
+        
+        self.session = requests.Session()
+        self.session.verify = False
+        self.session.headers.update({
+            "Content-Type": "application/json",
+            "Connection": "keep-alive"
+        })
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+    
+    def request(self, method, path, **kwargs):
+        """
+        Send a request to the API, authenticated if a token is set.
+        
+        On 401, the token is dropped from the cache and the request is
+        sent again once with a fresh token from relogin().
+        """
+        headers = kwargs.pop("headers", {})
+        token = self.token
+        if token:
+            headers["X-AUTH-TOKEN"] = token
+        response = self._send(method, path, headers, kwargs)
+        
+        if response.status_code != 401 or not token or not self.relogin:
+            return response
+        
+        with self._auth_lock:
+            # Another thread may already have logged in again
+            if self.token == token:
+                logging.info("Token rejected by Centreon, logging in again")
+                self.token = None
+                if self.token_cache:
+                    self.token_cache.invalidate()
+                self.relogin(self)
+        
+        if not self.token or self.token == token:
+            return response
+        headers["X-AUTH-TOKEN"] = self.token
+        return self._send(method, path, headers, kwargs)
+    
+    def _send(self, method, path, headers, kwargs):
+        _request_timing.connect_time = 0.0
+        _request_timing.server_time = None
+        if self.breaker is not None and not self.breaker.allow():
+            raise CircuitOpenError(f"Circuit breaker open, Centreon requests paused "
+                                   f"for {self.breaker.retry_after():.0f}s")
+        if self.limiter is not None:
+            self.limiter.acquire()
+        
+        started = time.monotonic()
+        try:
+            response = self.session.request(method, f"{self.api_url}{path}", headers=headers, **kwargs)
+        except Exception:
+            self._record_outcome(time.monotonic() - started, None, (method, path))
+            raise
+        self._record_outcome(time.monotonic() - started, response.status_code, (method, path))
+        # elapsed runs from sending until headers are parsed, connection setup included
+        _request_timing.server_time = max(0.0, response.elapsed.total_seconds() - _request_timing.connect_time)
+        return response
+    
+    def _record_outcome(self, latency, status_code, kind=None):
+        """
+        Feed the limiter and the circuit breaker, status_code is None when no
+        response came back, kind is the request type (method and path)
+        """
+        if self.limiter is not None:
+            self.limiter.release(latency, failed=status_code is None or status_code >= 500 or status_code == 429,
+                                 kind=kind)
+        if self.breaker is not None:
+            self.breaker.record(failed=status_code is None or status_code in RETRY_STATUSES)
+    
+    @staticmethod
+    def last_timing():
+        """Connect and server time of the last request sent by this thread"""
+        return {
+            "connect_time": getattr(_request_timing, "connect_time", None),
+            "server_time": getattr(_request_timing, "server_time", None)
+        }
+    
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+    
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+    
+    def connection_stats(self):
+        """Requests sent vs TCP/TLS connections opened by the pool"""
+        pools = self.adapter.poolmanager.pools
+        requests_sent = 0
+        connections = 0
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                requests_sent += pool.num_requests
+                connections += pool.num_connections
+        return {
+            "requests": requests_sent,
+            "connections": connections,
+            "reused": max(0, requests_sent - connections)
+        }
+    
+    def close(self):
+        self.session.close()
+
+# ===============================================
+# DASHBOARD WRITER
+# ===============================================
+
+class DashboardWriter:
+    """
+    Background thread writing acknowledgment rows to the dashboard DB.
+    
+    Rows are queued by the ack workers and written with one bulk insert
+    when flush_size rows are waiting or flush_interval seconds have passed.
+    Rows that cannot be written are appended to a spool file, replayed
+    when the next writer starts; lines torn by a crash are skipped.
+    """
+    
+    _STOP = object()
+    
+    def __init__(self, flush_size=DB_FLUSH_SIZE, flush_interval=DB_FLUSH_INTERVAL, spool_file=DB_SPOOL_FILE):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.spool_file = spool_file
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self.written = 0
+        self.spooled = 0
+        self.flushes = 0
+        self.write_time = 0.0
+    
+    def start(self):
+        self._replay_spool()
+        self.thread.start()
+        atexit.register(self.close)
+    
+    def put(self, row):
+        self.queue.put(row)
+    
+    def close(self):
+        """Flush every queued row and stop the thread"""
+        if self.thread.is_alive():
+            self.queue.put(self._STOP)
+            self.thread.join()
+    
+    def _run(self):
+        rows = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0, deadline - time.monotonic())
+            try:
+                row = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                row = None
+            
+            if row is self._STOP:
+                self._flush(rows)
+                return
+            if row is not None:
+                rows.append(row)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+            
+            if rows and (len(rows) >= self.flush_size or time.monotonic() >= deadline):
+                self._flush(rows)
+                rows = []
+                deadline = None
+    
+    def _flush(self, rows):
+        if not rows:
+            return
+        started = time.monotonic()
+        try:
+            written = recorder.save_acknowledgments(rows)
+        except Exception as e:
+            logging.error(f"Dashboard write error: {e}")
+            written = None
+        self.write_time += time.monotonic() - started
+        
+        if written is None:
+            self._spool(rows)
+        else:
+            self.written += written
+            self.flushes += 1
+            logging.debug(f"{written} acknowledgments saved to dashboard")
+    
+    def _spool(self, rows):
+        try:
+            with open(self.spool_file, 'a', encoding='utf-8') as f:
+                for row in rows:
+                    f.write(json.dumps(dict(row, acknowledged_at=row["acknowledged_at"].isoformat())) + "\n")
+            self.spooled += len(rows)
+            logging.warning(f"{len(rows)} acknowledgments spooled to {self.spool_file}")
+        except Exception as e:
+            logging.error(f"Spool error, {len(rows)} acknowledgments lost: {e}")
+    
+    def _replay_spool(self):
+        """Write the rows spooled by earlier runs, including a replay interrupted by a crash"""
+        replay_file = f"{self.spool_file}.replay"
+        try:
+            if os.path.exists(self.spool_file):
+                if os.path.exists(replay_file):
+                    with open(self.spool_file, encoding='utf-8') as source, \
+                            open(replay_file, 'a', encoding='utf-8') as target:
+                        # Newline first: the replay file may end with a torn line
+                        target.write("\n" + source.read())
+                    os.remove(self.spool_file)
+                else:
+                    os.replace(self.spool_file, replay_file)
+            if not os.path.exists(replay_file):
+                return
+            rows = self._read_spool(replay_file)
+        except OSError as e:
+            logging.error(f"Spool replay error, spooled acknowledgments kept for next run: {e}")
+            return
+        
+        logging.info(f"Replaying {len(rows)} spooled acknowledgments")
+        for start in range(0, len(rows), self.flush_size):
+            self._flush(rows[start:start + self.flush_size])
+        os.remove(replay_file)
+    
+    def _read_spool(self, path):
+        """Rows of a spool file, skipping lines torn by a crash while spooling"""
+        rows = []
+        invalid = 0
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                    row["acknowledged_at"] = datetime.fromisoformat(row["acknowledged_at"])
+                except (ValueError, TypeError, KeyError):
+                    invalid += 1
+                    continue
+                rows.append(row)
+        if invalid:
+            logging.warning(f"{invalid} unreadable lines skipped in {path}")
+        return rows
+
+# Started by main() when the dashboard is available
+dashboard_writer = None
+
+# Loaded by main() unless DEDUP_CACHE_FILE is empty
+dedup_cache = None
+
+# Compiled by main() from ACK_RULES_FILE, None acknowledges every alert with ACK_COMMENT
+ack_rules = None
+
 # ===============================================
 # FUNCTIONS
 # ===============================================
 
+def load_recorder():
+    """
+    Import the dashboard recorder, the Flask-free write path of the dashboard
+    database. Deferred to startup so the script never loads Flask, and runs
+    standalone when the dashboard files or their dependencies are missing.
+    """
+    global DASHBOARD_ENABLED, recorder
+    if DASHBOARD_ENABLED is None:
+        try:
+            # Add parent directory to path for recorder import
+            sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+            import recorder
+            DASHBOARD_ENABLED = True
+            print("Dashboard detected - Integration enabled")
+        except ImportError:
+            DASHBOARD_ENABLED = False
+            print("Dashboard not detected - Standalone mode")
+    return recorder
+
 def configure_logging():
     """Configure simplified logging system"""
     # Create directories
@@ -97,14 +841,13 @@ def configure_logging():
     console.setFormatter(formatter)
     logging.getLogger('').addHandler(console)
 
-def get_token():
+def get_token(client):
     """Get authentication token from Centreon API"""
     logging.info(f"Connecting to {API_URL}")
     
     try:
-        response = requests.post(
-            f"{API_URL}/login",
-            headers={"Content-Type": "application/json"},
+        response = client.post(
+            "/login",
             json={
                 "security": {
                     "credentials": {
@@ -113,11 +856,13 @@ def get_token():
                     }
                 }
             },
-            verify=False,
             timeout=LOGIN_TIMEOUT
         )
         response.raise_for_status()
         token = response.json()["security"]["token"]
+        client.token = token
+        if client.token_cache:
+            client.token_cache.store(token)
         logging.info("Centreon connection successful")
         return token
     except requests.exceptions.Timeout:
@@ -139,135 +884,389 @@ def get_token():
         logging.error(f"Centreon connection error: {e}")
         return None
 
-def get_unhandled_alerts(token):
-    """Get unacknowledged alerts from Centreon API"""
-    if not token:
+def authenticate(client):
+    """Reuse the cached token if still valid, log in otherwise"""
+    if client.token_cache:
+        token = client.token_cache.load()
+        if token:
+            logging.info("Reusing cached Centreon token")
+            client.token = token
+            return token
+    return get_token(client)
+
+def fetch_alerts_page(client, page):
+    """
+    Fetch one page of unhandled alerts, returns (alerts, meta). Connection
+    errors are retried with backoff, and the circuit breaker waited out.
+    """
+    for attempt in range(ACK_RETRIES + 1):
+        try:
+            response = client.get(
+                "/monitoring/resources",
+                params={
+                    "page": page,
+                    "limit": ALERT_LIMIT,
+                    "states[]": "unhandled_problems",
+                    "types[]": "service",
+                    "statuses[]": ["WARNING", "CRITICAL"]
+                },
+                timeout=API_TIMEOUT
+            )
+            break
+        except (CircuitOpenError, requests.exceptions.ConnectionError):
+            if attempt == ACK_RETRIES:
+                raise
+            time.sleep(retry_delay(client, attempt + 1))
+    response.raise_for_status()
+    data = response.json()
+    return data.get("result", []), data.get("meta", {})
+
+def get_unhandled_alerts(client):
+    """
+    Get unacknowledged alerts from Centreon API.
+    
+    Returns (total, alerts) where alerts is a generator walking every page.
+    Pages are served from the last one back to the first: acknowledged
+    alerts leave the unhandled list, which only shifts the pages after
+    them. The next page is prefetched while the current one is processed.
+    """
+    if not client.token:
         logging.error("Missing authentication token")
-        return []
+        return 0, iter([])
     
     logging.info("Retrieving alerts")
     
     try:
-        response = requests.get(
-            f"{API_URL}/monitoring/resources",
-            headers={
-                "Content-Type": "application/json",
-                "X-AUTH-TOKEN": token
-            },
-            params={
-                "page": 1,
-                "limit": ALERT_LIMIT,
-                "states[]": "unhandled_problems",
-                "types[]": "service",
-                "statuses[]": ["WARNING", "CRITICAL"]
-            },
-            verify=False,
-            timeout=API_TIMEOUT
-        )
-        response.raise_for_status()
-        alerts = response.json().get("result", [])
-        logging.info(f"{len(alerts)} alerts found")
-        return alerts
+        first_page, meta = fetch_alerts_page(client, 1)
     except requests.exceptions.Timeout:
         logging.error("Alert retrieval timeout")
         logging.info("Suggestion: Increase API_TIMEOUT in .env file")
-        return []
+        return 0, iter([])
     except requests.exceptions.HTTPError as e:
         logging.error(f"HTTP error retrieving alerts: {e}")
         if hasattr(e.response, 'status_code') and e.response.status_code == 401:
             logging.error("Token expired or invalid")
-        return []
+        return 0, iter([])
     except Exception as e:
         logging.error(f"Alert retrieval error: {e}")
-        return []
+        return 0, iter([])
+    
+    total = meta.get("total", len(first_page))
+    page_count = max(1, -(-total // ALERT_LIMIT))
+    logging.info(f"{total} alerts found ({page_count} pages)")
+    
+    def iter_pages():
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="page") as executor:
+            next_page = executor.submit(fetch_alerts_page, client, page_count) if page_count > 1 else None
+            for page in range(page_count, 1, -1):
+                try:
+                    alerts, _ = next_page.result()
+                except Exception as e:
+                    logging.error(f"Alert retrieval error on page {page}: {e}")
+                    alerts = []
+                next_page = executor.submit(fetch_alerts_page, client, page - 1) if page > 2 else None
+                logging.debug(f"Processing page {page}/{page_count} ({len(alerts)} alerts)")
+                yield from alerts
+        yield from first_page
+    
+    return total, iter_pages()
 
-def acknowledge_service(token, service_id, host_id, service_name=None, host_name=None, 
-                       status=None, comment="Auto ACK by Miguel"):
-    """Acknowledge a service alert"""
-    if not token:
-        logging.error("Missing token")
-        return False
-        
-    try:
-        response = requests.post(
-            f"{API_URL}/monitoring/resources/acknowledge",
-            headers={
-                "Content-Type": "application/json",
-                "X-AUTH-TOKEN": token
+def parse_alert(alert):
+    """Extract the fields needed for acknowledgment from an API alert"""
+    return {
+        "service_id": alert.get("service_id"),
+        "host_id": alert.get("host_id"),
+        "service_name": alert.get("name", "Unknown"),
+        "host_name": alert.get("parent", {}).get("name", "Unknown"),
+        "status": alert.get("status", {}).get("name", "UNKNOWN"),
+        "hostgroups": [group.get("name") for group in alert.get("parent", {}).get("groups") or []]
+    }
+
+def ack_comment(service):
+    """Comment to acknowledge a service with, None if the rules leave it unacknowledged"""
+    if ack_rules is None:
+        return ACK_COMMENT
+    return ack_rules.comment_for(service)
+
+def record_acknowledgment(service, success, error_message=None, timing=None, retry_count=0):
+    """Save an acknowledgment result to dashboard if available"""
+    if not DASHBOARD_ENABLED:
+        return
+    
+    timing = timing or {}
+    row = {
+        "service_id": str(service["service_id"]),
+        "host_id": str(service["host_id"]),
+        "service_name": service.get("service_name"),
+        "host_name": service.get("host_name"),
+        "status": service.get("status"),
+        "acknowledged_at": datetime.utcnow(),
+        "success": success,
+        "error_message": error_message,
+        "response_time": timing.get("response_time"),
+        "connect_time": timing.get("connect_time"),
+        "server_time": timing.get("server_time"),
+        "retry_count": retry_count
+    }
+    
+    if dashboard_writer is not None:
+        dashboard_writer.put(row)
+        return
+    
+    recorder.save_acknowledgment(**{key: value for key, value in row.items() if key != "acknowledged_at"})
+    if success:
+        logging.debug("Acknowledgment saved to dashboard")
+
+def post_acknowledgement(client, services, comment):
+    """Send one acknowledge request covering all given services"""
+    response = client.post(
+        "/monitoring/resources/acknowledge",
+        json={
+            "acknowledgement": {
+                "comment": comment,
+                "is_notify_contacts": False,
+                "is_persistent_comment": True,
+                "is_sticky": True,
+                "with_services": False
             },
-            json={
-                "acknowledgement": {
-                    "comment": comment,
-                    "is_notify_contacts": False,
-                    "is_persistent_comment": True,
-                    "is_sticky": True,
-                    "with_services": False
-                },
-                "resources": [
-                    {
-                        "type": "service",
-                        "id": service_id,
-                        "parent": {
-                            "id": host_id
-                        }
+            "resources": [
+                {
+                    "type": "service",
+                    "id": service["service_id"],
+                    "parent": {
+                        "id": service["host_id"]
                     }
-                ]
-            },
-            verify=False,
-            timeout=ACK_TIMEOUT
-        )
-        response.raise_for_status()
-        
-        # Save to dashboard if available
-        if DASHBOARD_ENABLED:
-            with app.app_context():
-                save_acknowledgment(
-                    service_id=service_id,
-                    host_id=host_id,
-                    service_name=service_name,
-                    host_name=host_name,
-                    status=status,
-                    success=True
-                )
-                logging.debug("Acknowledgment saved to dashboard")
-        
+                }
+                for service in services
+            ]
+        },
+        timeout=ACK_TIMEOUT
+    )
+    response.raise_for_status()
+
+def is_retryable(error):
+    """Failures worth sending the same acknowledgment again: timeouts, connection errors, 502/503/504"""
+    if isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
         return True
-    except requests.exceptions.Timeout:
-        error_msg = f"Acknowledgment timeout for service {service_id}"
-        logging.error(error_msg)
-        
-        # Save failure to dashboard if available
-        if DASHBOARD_ENABLED:
-            with app.app_context():
-                save_acknowledgment(
-                    service_id=service_id,
-                    host_id=host_id,
-                    service_name=service_name,
-                    host_name=host_name,
-                    status=status,
-                    success=False,
-                    error_message=error_msg
-                )
-        
-        return False
+    response = getattr(error, "response", None)
+    return isinstance(error, requests.exceptions.HTTPError) and response is not None \
+        and response.status_code in RETRY_STATUSES
+
+def is_rejection(error):
+    """Failures caused by some resources of the batch (400/409/422), not by the server or the credentials"""
+    response = getattr(error, "response", None)
+    return isinstance(error, requests.exceptions.HTTPError) and response is not None \
+        and response.status_code in REJECT_STATUSES
+
+def retry_delay(client, attempt):
+    """Jittered exponential backoff before retry number attempt, at least until the circuit breaker closes"""
+    delay = min(ACK_RETRY_MAX_DELAY, ACK_RETRY_BACKOFF * 2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+    if client.breaker is not None:
+        delay = max(delay, client.breaker.retry_after())
+    return delay
+
+def acknowledge_services(client, services, comment=ACK_COMMENT, attempt=0):
+    """
+    Acknowledge several service alerts in a single request.
+    
+    Timeouts, connection errors and 502/503/504 are retried up to
+    ACK_RETRIES times by the caller, after a backoff, through the same
+    limiter and circuit breaker: None is returned for those services and
+    nothing is recorded yet. attempt is the number of retries already
+    made. If the batch is rejected (400/409/422), it is split in half
+    until the failing resources are isolated; other errors fail it
+    whole. The request's timing is recorded once, on its first service,
+    so response time percentiles count requests rather than weighting
+    them by batch size. Returns one success flag per service, in order.
+    """
+    if not client.token:
+        logging.error("Missing token")
+        return [False] * len(services)
+    
+    started = time.monotonic()
+    try:
+        post_acknowledgement(client, services, comment)
     except Exception as e:
-        error_msg = f"Failed to acknowledge service {service_id}: {e}"
-        logging.error(error_msg)
+        if is_retryable(e) and attempt < ACK_RETRIES:
+            logging.warning(f"Acknowledgment of {len(services)} service(s) failed ({e}), "
+                            f"retry {attempt + 1}/{ACK_RETRIES} scheduled")
+            return [None] * len(services)
         
-        # Save failure to dashboard if available
-        if DASHBOARD_ENABLED:
-            with app.app_context():
-                save_acknowledgment(
-                    service_id=service_id,
-                    host_id=host_id,
-                    service_name=service_name,
-                    host_name=host_name,
-                    status=status,
-                    success=False,
-                    error_message=str(e)
-                )
+        # Splitting only helps to isolate a rejected service, not against an unavailable
+        # server, missing permissions or a wrong URL: those fail the whole batch at once
+        if len(services) > 1 and is_rejection(e):
+            logging.warning(f"Batch of {len(services)} acknowledgments failed ({e}), splitting")
+            middle = len(services) // 2
+            return (acknowledge_services(client, services[:middle], comment, attempt) +
+                    acknowledge_services(client, services[middle:], comment, attempt))
         
-        return False
+        timing = dict(client.last_timing(), response_time=time.monotonic() - started)
+        for index, service in enumerate(services):
+            if isinstance(e, requests.exceptions.Timeout):
+                error_msg = f"Acknowledgment timeout for service {service['service_id']}"
+                logging.error(error_msg)
+                record_acknowledgment(service, False, error_msg, timing if index == 0 else None, attempt)
+            else:
+                logging.error(f"Failed to acknowledge service {service['service_id']}: {e}")
+                record_acknowledgment(service, False, str(e), timing if index == 0 else None, attempt)
+        return [False] * len(services)
+    
+    timing = dict(client.last_timing(), response_time=time.monotonic() - started)
+    for index, service in enumerate(services):
+        record_acknowledgment(service, True, timing=timing if index == 0 else None, retry_count=attempt)
+    return [True] * len(services)
+
+def acknowledge_alerts(client, alerts, total=None, stop_event=None):
+    """
+    Acknowledge alerts through a bounded pool of worker threads.
+    
+    Alerts may be any iterable, including a generator still fetching
+    pages. Batches are submitted to ACK_CONCURRENCY workers, with at most
+    ACK_MAX_IN_FLIGHT batches pending at once. Results are logged and
+    counted here, in the calling thread. Failures worth a retry come back
+    unrecorded and are submitted again once their backoff has elapsed,
+    without holding a worker meanwhile. Once stop_event is set, no new
+    batch or retry is submitted. Alerts left out by the rules or found in
+    the dedup cache are skipped before any request; the others are
+    batched with alerts sharing their comment; at most ACK_CONCURRENCY
+    partial batches are held, the oldest is sent when another comment
+    comes up. Returns (successful, failed, skipped).
+    """
+    if total is None:
+        total = len(alerts)
+    successful_acks = 0
+    failed_acks = 0
+    skipped = 0
+    retried = 0
+    recovered = 0
+    pending = set()
+    pending_batches = {}
+    # Batches being filled, per comment
+    batches = {}
+    # Heap of (due time, sequence, attempt, batch) waiting for their retry
+    retries = []
+    sequence = itertools.count()
+    # Services claimed in the dedup cache, released when the run ends whatever happens
+    claimed = []
+    
+    def handle_done(done):
+        nonlocal successful_acks, failed_acks, recovered
+        for future in done:
+            batch, attempt = pending_batches.pop(future)
+            try:
+                results = future.result()
+            except Exception as e:
+                logging.error(f"Acknowledgment worker error: {e}")
+                results = [False] * len(batch)
+            deferred = []
+            for (i, service), success in zip(batch, results):
+                if success is None:
+                    deferred.append((i, service))
+                    continue
+                if dedup_cache is not None:
+                    dedup_cache.release(service, success)
+                if success:
+                    successful_acks += 1
+                    recovered += attempt > 0
+                    logging.info(f"[{i:2d}/{total}] SUCCESS: {service['service_name']} on {service['host_name']}")
+                else:
+                    failed_acks += 1
+                    logging.error(f"[{i:2d}/{total}] FAILED: {service['service_name']} on {service['host_name']}")
+            if deferred:
+                due = time.monotonic() + retry_delay(client, attempt + 1)
+                heapq.heappush(retries, (due, next(sequence), attempt + 1, deferred))
+    
+    def submit(executor, batch, attempt=0):
+        nonlocal pending
+        while len(pending) >= ACK_MAX_IN_FLIGHT:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            handle_done(done)
+        future = executor.submit(acknowledge_services, client, [service for _, service in batch],
+                                 batch[0][1]["comment"], attempt=attempt)
+        pending_batches[future] = (batch, attempt)
+        pending.add(future)
+    
+    def submit_due(executor):
+        nonlocal retried
+        while retries and retries[0][0] <= time.monotonic():
+            _, _, attempt, batch = heapq.heappop(retries)
+            retried += 1
+            submit(executor, batch, attempt)
+    
+    def drop_retries():
+        nonlocal failed_acks
+        logging.warning(f"Stop requested, {sum(len(batch) for *_, batch in retries)} acknowledgments "
+                        f"waiting for a retry recorded as failed")
+        while retries:
+            _, _, attempt, batch = heapq.heappop(retries)
+            for i, service in batch:
+                failed_acks += 1
+                if dedup_cache is not None:
+                    dedup_cache.release(service, False)
+                record_acknowledgment(service, False, "Retry cancelled by shutdown", retry_count=attempt - 1)
+                logging.error(f"[{i:2d}/{total}] FAILED: {service['service_name']} on {service['host_name']}")
+    
+    try:
+        with ThreadPoolExecutor(max_workers=ACK_CONCURRENCY, thread_name_prefix="ack") as executor:
+            for i, alert in enumerate(alerts, 1):
+                if stop_event is not None and stop_event.is_set():
+                    logging.warning("Stop requested, remaining alerts left for next run")
+                    batches = {}
+                    break
+                
+                service = parse_alert(alert)
+                has_ids = service["service_id"] and service["host_id"]
+                service["comment"] = ack_comment(service) if has_ids else None
+                
+                if not has_ids:
+                    failed_acks += 1
+                    logging.warning(f"[{i:2d}/{total}] Missing ID: {service['service_name']} on {service['host_name']}")
+                elif service["comment"] is None:
+                    skipped += 1
+                    logging.info(f"[{i:2d}/{total}] SKIPPED: {service['service_name']} on {service['host_name']} "
+                                 f"(not selected by the rules)")
+                elif dedup_cache is not None and not dedup_cache.claim(service):
+                    skipped += 1
+                    logging.info(f"[{i:2d}/{total}] SKIPPED: {service['service_name']} on {service['host_name']} "
+                                 f"(acknowledged recently)")
+                else:
+                    if dedup_cache is not None:
+                        claimed.append(service)
+                    batch = batches.setdefault(service["comment"], [])
+                    batch.append((i, service))
+                    if len(batch) >= ACK_BATCH_SIZE:
+                        submit(executor, batches.pop(service["comment"]))
+                    elif len(batches) > ACK_CONCURRENCY:
+                        # Many distinct comments: send the oldest partial batch rather than hold it
+                        submit(executor, batches.pop(next(iter(batches))))
+                submit_due(executor)
+            
+            for batch in batches.values():
+                submit(executor, batch)
+            
+            # Wait for the last batches, sending retries as they come due
+            while pending or retries:
+                if retries and stop_event is not None and stop_event.is_set():
+                    drop_retries()
+                    continue
+                timeout = max(0.0, retries[0][0] - time.monotonic()) if retries else None
+                if pending:
+                    done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                    handle_done(done)
+                elif stop_event is not None:
+                    stop_event.wait(timeout)
+                else:
+                    time.sleep(timeout)
+                submit_due(executor)
+    finally:
+        # Claims of alerts left unfinished by an error would skip them until a restart
+        if dedup_cache is not None:
+            for service in claimed:
+                dedup_cache.release(service, False)
+    
+    if retried:
+        logging.info(f"Retries: {retried} requests sent again, {recovered} alerts acknowledged after a retry")
+    return successful_acks, failed_acks, skipped
 
 def save_alerts_to_file(alerts):
     """Save alerts to JSON file"""
@@ -283,61 +1282,169 @@ def save_alerts_to_file(alerts):
     except Exception as e:
         logging.error(f"Save error: {e}")
 
-def main():
-    """Main function"""
-    configure_logging()
-    
-    logging.info("Starting acknowledgment script")
-    
-    if DASHBOARD_ENABLED:
-        logging.info("Dashboard integration active - Real-time data available")
-    
-    # Get token
-    token = get_token()
-    if not token:
+def run(client, stop_event=None):
+    """Acknowledge all unhandled alerts once"""
+    # Get token (kept between runs in daemon mode)
+    if not client.token and not authenticate(client):
         logging.error("Cannot continue without token")
         return
     
     # Get alerts
-    alerts = get_unhandled_alerts(token)
-    if not alerts:
+    total, alerts = get_unhandled_alerts(client)
+    if not total:
         logging.info("No alerts to process")
         return
-        
-    # Save alerts
-    save_alerts_to_file(alerts)
     
-    # Acknowledge alerts
-    logging.info(f"Starting acknowledgment of {len(alerts)} alerts")
-    successful_acks = 0
-    failed_acks = 0
+    # Acknowledge alerts while pages are still arriving
+    logging.info(f"Starting acknowledgment of {total} alerts")
+    received = []
     
-    for i, alert in enumerate(alerts, 1):
-        service_id = alert.get("service_id")
-        host_id = alert.get("host_id")
-        service_name = alert.get("name", "Unknown")
-        host_name = alert.get("parent", {}).get("name", "Unknown")
-        status = alert.get("status", {}).get("name", "UNKNOWN")
-        
-        if service_id and host_id:
-            if acknowledge_service(token, service_id, host_id, service_name, host_name, status):
-                successful_acks += 1
-                logging.info(f"[{i:2d}/{len(alerts)}] SUCCESS: {service_name} on {host_name}")
-            else:
-                failed_acks += 1
-                logging.error(f"[{i:2d}/{len(alerts)}] FAILED: {service_name} on {host_name}")
-        else:
-            failed_acks += 1
-            logging.warning(f"[{i:2d}/{len(alerts)}] Missing ID: {service_name} on {host_name}")
+    def keep(alerts):
+        for alert in alerts:
+            received.append(alert)
+            yield alert
+    
+    try:
+        successful_acks, failed_acks, skipped = acknowledge_alerts(client, keep(alerts), total, stop_event)
+    finally:
+        if dedup_cache is not None:
+            dedup_cache.save()
+    
+    # Save alerts
+    save_alerts_to_file(received)
     
     # Summary
-    logging.info(f"Summary: {successful_acks} successful, {failed_acks} failed out of {len(alerts)} alerts")
+    logging.info(f"Summary: {successful_acks} successful, {failed_acks} failed, {skipped} skipped "
+                 f"out of {len(received)} alerts")
     
     if failed_acks > 0:
         logging.warning("Some failures occurred. Check timeouts or connectivity.")
     
     if DASHBOARD_ENABLED:
         logging.info("Check dashboard for real-time visualization: http://localhost:5000")
+
+@contextmanager
+def run_lock():
+    """Exclusive lock preventing overlapping runs (cron or daemon), yields False if busy"""
+    if fcntl is None or not RUN_LOCK_FILE:
+        yield True
+        return
+    
+    os.makedirs(os.path.dirname(RUN_LOCK_FILE), exist_ok=True)
+    with open(RUN_LOCK_FILE, 'w') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def run_once(client, stop_event=None):
+    """Run once unless another run currently holds the lock"""
+    with run_lock() as acquired:
+        if not acquired:
+            logging.warning("Previous run still in progress, skipping")
+            return
+        run(client, stop_event)
+
+def run_daemon(client, interval, jitter, stop_event):
+    """Poll Centreon until stop_event is set, reusing session, token and DB connection"""
+    logging.info(f"Daemon mode: polling every {interval}s (jitter {jitter}s)")
+    while not stop_event.is_set():
+        started = time.monotonic()
+        try:
+            run_once(client, stop_event)
+        except Exception as e:
+            logging.exception(f"Run failed: {e}")
+        
+        # Fixed rate: a run longer than the interval starts the next one at once
+        delay = interval - (time.monotonic() - started) + random.uniform(-jitter, jitter)
+        stop_event.wait(max(0, delay))
+    
+    logging.info("Daemon stopped")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Centreon alert auto-acknowledgment")
+    parser.add_argument("--daemon", action="store_true",
+                        help="keep running and poll Centreon periodically")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL,
+                        help=f"seconds between polls in daemon mode (default: {POLL_INTERVAL})")
+    parser.add_argument("--jitter", type=float, default=POLL_JITTER,
+                        help=f"random +/- seconds added to each interval (default: {POLL_JITTER})")
+    return parser.parse_args()
+
+def main():
+    """Main function"""
+    global dashboard_writer, dedup_cache, ack_rules
+    
+    args = parse_args()
+    configure_logging()
+    
+    logging.info("Starting acknowledgment script")
+    
+    if ACK_RULES_FILE:
+        started = time.monotonic()
+        try:
+            ack_rules = load_rules(ACK_RULES_FILE, ACK_COMMENT)
+        except RulesError as e:
+            logging.error(f"Invalid acknowledgment rules: {e}")
+            sys.exit(1)
+        logging.info(f"{len(ack_rules)} acknowledgment rules loaded from {ACK_RULES_FILE} "
+                     f"in {time.monotonic() - started:.2f}s")
+    
+    # SIGTERM/SIGINT stop new batches; queued dashboard rows are still written
+    stop_event = threading.Event()
+    
+    def handle_signal(signum, frame):
+        logging.info(f"Received signal {signum}, stopping after current batches")
+        stop_event.set()
+    
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+    
+    if load_recorder():
+        logging.info("Dashboard integration active - Real-time data available")
+        # Migrations (indexes, ANALYZE, rollup rebuild) are left to flask init-db
+        try:
+            recorder.ensure_tables()
+        except Exception as e:
+            logging.error(f"Dashboard database unavailable, rows will be spooled: {e}")
+        dashboard_writer = DashboardWriter()
+        dashboard_writer.start()
+    
+    token_cache = TokenCache(TOKEN_CACHE_FILE, API_URL, LOGIN) if TOKEN_CACHE_FILE else None
+    if DEDUP_CACHE_FILE:
+        dedup_cache = DedupCache(DEDUP_CACHE_FILE)
+        dedup_cache.load()
+    limiter = AdaptiveLimiter() if API_ADAPTIVE_LIMIT else None
+    breaker = CircuitBreaker() if BREAKER_THRESHOLD > 0 else None
+    client = CentreonClient(API_URL, token_cache=token_cache, relogin=get_token, limiter=limiter, breaker=breaker)
+    try:
+        if args.daemon:
+            run_daemon(client, args.interval, args.jitter, stop_event)
+        else:
+            run_once(client, stop_event)
+    finally:
+        if dashboard_writer is not None:
+            dashboard_writer.close()
+            logging.info(f"Dashboard writes: {dashboard_writer.written} rows in {dashboard_writer.flushes} "
+                         f"bulk inserts ({dashboard_writer.write_time:.2f}s), {dashboard_writer.spooled} spooled")
+        logging.info(f"HTTP connections: {client.connection_stats()}")
+        if limiter:
+            logging.info(f"API pacing: {limiter.stats()}")
+        if breaker:
+            logging.info(f"Circuit breaker: {breaker.stats()}")
+        if ack_rules:
+            logging.info(f"Acknowledgment rules: {ack_rules.stats()}")
+        if token_cache:
+            hits, misses = token_cache.hits, token_cache.misses
+            total_hits, total_misses = token_cache.save_stats()
+            logging.info(f"Token cache: {hits} hits, {misses} misses "
+                         f"(total: {total_hits} hits, {total_misses} misses)")
+        client.close()
     
     logging.info("Script completed")
 
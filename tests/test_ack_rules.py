@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+
+from ack_rules import RulesError, compile_rules
+
+
+def test_default_rule_acknowledges_unmatched_alerts():
+    rules = compile_rules({'rules': [], 'default': {'comment': 'x {host_name}'}}, 'Auto ACK')
+    assert rules.comment_for({'host_name': 'mail-1', 'service_name': 'SMTP'}) == 'x mail-1'
+
+
+@pytest.mark.parametrize('key, value', [
+    ('host', 'web-*'),
+    ('service', 'HTTP'),
+    ('status', 'CRITICAL'),
+    ('hostgroup', 'linux-*'),
+])
+def test_default_rule_rejects_conditions(key, value):
+    with pytest.raises(RulesError, match=key):
+        compile_rules({'rules': [], 'default': {key: value, 'comment': 'x {host_name}'}}, 'Auto ACK')